@@ -1,62 +1,176 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+from flask.json.provider import DefaultJSONProvider
 from dotenv import load_dotenv
 import os
+import orjson
+import hashlib
+import hmac
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import jwt
-from functools import wraps
+from functools import lru_cache, wraps
 import openai
+from cachetools import TTLCache
+from jinja2 import DictLoader, Environment
 from models.user import User
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from services import insight_cache
+from services.document_service import warm_templates
+from services.openai_client import create_chat_completion
+from database import create_db_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
 
 # Load environment variables
 load_dotenv()
 
+class ORJSONProvider(DefaultJSONProvider):
+    """Serialize responses with orjson, falling back to Flask's encoder for unknown types."""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 CORS(app)
 
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 openai.api_key = os.getenv('OPENAI_API_KEY')
 
+# Business insights cache: identical (industry, state) prompts reuse the last completion
+INSIGHTS_MODEL = "gpt-3.5-turbo"
+INSIGHTS_SYSTEM_PROMPT = "You are Adam, an expert business advisor."
+_INSIGHTS_CACHE = TTLCache(maxsize=4096, ttl=3600)
+_INSIGHTS_CACHE_LOCK = threading.Lock()
+
+# Decoded JWT payloads keyed by token digest, so repeat requests skip signature checks
+_JWT_CACHE = TTLCache(maxsize=10_000, ttl=60)
+_JWT_CACHE_LOCK = threading.Lock()
+
+# Recently verified credentials, so repeat logins skip the bcrypt work factor
+_PW_CACHE = TTLCache(maxsize=5000, ttl=300)
+_PW_CACHE_LOCK = threading.Lock()
+
+# Document templates are compiled once at import; requests only render them
+_DOCUMENT_ENV = Environment(
+    loader=DictLoader({
+        'operating_agreement': 'Operating Agreement template content...',
+        'articles_of_organization': 'Articles of Organization template content...'
+    }),
+    autoescape=False
+)
+DOCUMENT_TEMPLATES = {
+    name: _DOCUMENT_ENV.get_template(name) for name in _DOCUMENT_ENV.list_templates()
+}
+
 # Database setup
-engine = create_engine('sqlite:///llc_formation.db')
-Session = sessionmaker(bind=engine)
-session = Session()
+engine = create_db_engine(
+    pool_size=10,
+    max_overflow=20,
+    pool_pre_ping=True
+)
+Session = scoped_session(sessionmaker(bind=engine))
+
+# Non-critical writes (e.g. last_login) run here so they don't hold up the response
+_WRITE_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='db-write')
+
+@app.teardown_appcontext
+def remove_session(exception=None):
+    Session.remove()
+
+def _record_login(user_id, logged_in_at):
+    session = Session()
+    try:
+        session.query(User).filter_by(id=user_id).update({'last_login': logged_in_at})
+        session.commit()
+    finally:
+        Session.remove()
 
 # Create admin user if it doesn't exist
 def create_admin_user():
     admin_email = os.getenv('ADMIN_EMAIL', 'admin@alfa.com')
     admin_password = os.getenv('ADMIN_PASSWORD', 'admin123')  # Change this in production
     
-    admin = session.query(User).filter_by(email=admin_email).first()
-    if not admin:
-        admin = User(
-            email=admin_email,
-            name='ALFA Admin',
-            role='admin'
-        )
-        admin.set_password(admin_password)
-        session.add(admin)
-        session.commit()
+    session = Session()
+    try:
+        admin = session.query(User).filter_by(email=admin_email).first()
+        if not admin:
+            admin = User(
+                email=admin_email,
+                name='ALFA Admin',
+                role='admin'
+            )
+            admin.set_password(admin_password)
+            session.add(admin)
+            session.commit()
+    finally:
+        Session.remove()
+
+@lru_cache(maxsize=1)
+def _iso_now(sec):
+    # Second resolution is enough for response timestamps; recomputed once per second
+    return datetime.utcfromtimestamp(sec).isoformat() + 'Z'
+
+def _decode_token(token):
+    key = hashlib.sha256(token.encode()).digest()
+    with _JWT_CACHE_LOCK:
+        data = _JWT_CACHE.get(key)
+    # Cached payloads must still honour the token's own expiry
+    if data is not None and data.get('exp', 0) > time.time():
+        return data
+
+    data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+    with _JWT_CACHE_LOCK:
+        _JWT_CACHE[key] = data
+    return data
+
+def _verify_password(user, password):
+    # The stored hash is part of the key, so a password change invalidates old entries
+    key = hmac.new(
+        (app.config['SECRET_KEY'] or '').encode(),
+        f"{user.id}:{user.password_hash}:{password}".encode(),
+        hashlib.sha256
+    ).digest()
+    with _PW_CACHE_LOCK:
+        if key in _PW_CACHE:
+            return True
+
+    if not user.check_password(password):
+        return False
+    with _PW_CACHE_LOCK:
+        _PW_CACHE[key] = True
+    return True
 
 # Authentication decorator
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
+        header = request.headers.get('Authorization')
+        if not header:
             return jsonify({'message': 'Token is missing'}), 401
+        scheme, _, token = header.partition(' ')
+        if scheme != 'Bearer' or not token:
+            return jsonify({'message': 'Token is invalid'}), 401
         try:
-            data = jwt.decode(token.split()[1], app.config['SECRET_KEY'], algorithms=["HS256"])
+            data = _decode_token(token)
         except:
             return jsonify({'message': 'Token is invalid'}), 401
+        g.token_data = data
         return f(*args, **kwargs)
     return decorated
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
+    return jsonify({'status': 'healthy', 'timestamp': _iso_now(int(time.time()))})
 
 @app.route('/api/login', methods=['POST'])
 def login():
@@ -64,14 +178,15 @@ def login():
     if not auth or not auth.get('email') or not auth.get('password'):
         return jsonify({'message': 'Could not verify'}), 401
     
+    session = Session()
     user = session.query(User).filter_by(email=auth.get('email')).first()
     
-    if not user or not user.check_password(auth.get('password')):
+    if not user or not _verify_password(user, auth.get('password')):
         return jsonify({'message': 'Invalid credentials'}), 401
     
-    # Update last login
+    # Update last login off the request thread
     user.last_login = datetime.utcnow()
-    session.commit()
+    _WRITE_EXECUTOR.submit(_record_login, user.id, user.last_login)
     
     token = jwt.encode({
         'user_id': user.id,
@@ -91,6 +206,7 @@ def register():
     if not data or not data.get('email') or not data.get('password'):
         return jsonify({'message': 'Missing required fields'}), 400
     
+    session = Session()
     existing_user = session.query(User).filter_by(email=data.get('email')).first()
     if existing_user:
         return jsonify({'message': 'Email already registered'}), 400
@@ -122,21 +238,69 @@ def start_llc_formation():
         }
     })
 
+def _store_insights(key, insights):
+    with _INSIGHTS_CACHE_LOCK:
+        _INSIGHTS_CACHE[key] = insights
+    insight_cache.put(key, insights)
+
+def _sse(payload):
+    return f"data: {orjson.dumps(payload).decode()}\n\n"
+
 @app.route('/api/business/insights', methods=['POST'])
 @token_required
 def get_business_insights():
     data = request.json
+    industry = data.get('industry')
+    state = data.get('state')
+    key = insight_cache.make_key(industry, state, INSIGHTS_MODEL, INSIGHTS_SYSTEM_PROMPT)
+    # Clients that accept server-sent events receive tokens as they are generated
+    wants_stream = request.accept_mimetypes.best == 'text/event-stream'
+
+    with _INSIGHTS_CACHE_LOCK:
+        insights = _INSIGHTS_CACHE.get(key)
+    if insights is None:
+        # Fall back to the cache shared with other workers
+        insights = insight_cache.get(key)
+        if insights is not None:
+            with _INSIGHTS_CACHE_LOCK:
+                _INSIGHTS_CACHE[key] = insights
+    if insights is not None:
+        if wants_stream:
+            return Response(_sse({'content': insights}) + _sse({'done': True}),
+                            mimetype='text/event-stream')
+        return jsonify({
+            'status': 'success',
+            'insights': insights
+        })
+
+    messages = [
+        {"role": "system", "content": INSIGHTS_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Provide strategic insights for a {industry} business in {state}"}
+    ]
+
     try:
         # Generate business insights using OpenAI
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are Adam, an expert business advisor."},
-                {"role": "user", "content": f"Provide strategic insights for a {data.get('industry')} business in {data.get('state')}"}
-            ]
+        response = create_chat_completion(
+            model=INSIGHTS_MODEL,
+            messages=messages,
+            stream=wants_stream
         )
+        if wants_stream:
+            def generate():
+                parts = []
+                for chunk in response:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield _sse({'content': delta})
+                _store_insights(key, ''.join(parts))
+                yield _sse({'done': True})
+
+            return Response(stream_with_context(generate()), mimetype='text/event-stream')
+
         insights = response.choices[0].message.content
-        
+        _store_insights(key, insights)
+
         return jsonify({
             'status': 'success',
             'insights': insights
@@ -150,21 +314,20 @@ def generate_documents():
     data = request.json
     document_type = data.get('documentType')
     
-    # Template generation logic would go here
-    templates = {
-        'operating_agreement': 'Operating Agreement template content...',
-        'articles_of_organization': 'Articles of Organization template content...'
-    }
+    template = DOCUMENT_TEMPLATES.get(document_type)
+    content = template.render(**data) if template else 'Template not found'
     
     return jsonify({
         'status': 'success',
         'document': {
             'type': document_type,
-            'content': templates.get(document_type, 'Template not found'),
-            'generated_at': datetime.now().isoformat()
+            'content': content,
+            'generated_at': _iso_now(int(time.time()))
         }
     })
 
 if __name__ == '__main__':
     create_admin_user()  # Create admin user on startup
+    insight_cache.start_purger()
+    warm_templates()
     app.run(debug=True)
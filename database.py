@@ -0,0 +1,34 @@
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+DEFAULT_DATABASE_URL = 'sqlite:///llc_formation.db'
+
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "cache_size=-64000",
+    "mmap_size=268435456",
+)
+
+# Pooled connections are handed between request threads, and writers wait on locks
+SQLITE_CONNECT_ARGS = {"check_same_thread": False, "timeout": 30}
+
+def create_db_engine(url=None, **kwargs):
+    """Create an engine, tuning every new SQLite connection for concurrent access."""
+    url = make_url(url or os.getenv('DATABASE_URL', DEFAULT_DATABASE_URL))
+    if url.get_backend_name() == 'sqlite':
+        kwargs['connect_args'] = {**SQLITE_CONNECT_ARGS, **kwargs.get('connect_args', {})}
+
+    engine = create_engine(url, **kwargs)
+
+    if engine.dialect.name == 'sqlite':
+        @event.listens_for(engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in SQLITE_PRAGMAS:
+                cursor.execute(f"PRAGMA {pragma}")
+            cursor.close()
+
+    return engine
@@ -1,8 +1,52 @@
+from sqlalchemy import inspect
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
-from .ai_employee import AIEmployee, AITask
+from .user import User
 from .business import Business
+from .ai_employee import AIEmployee, AITask
+from .document import Document
+from .compliance import ComplianceItem
+from .financial import FinancialRecord
+from .insight import BusinessInsight
+from .notification import Notification
+
+# Create database engine and tables
+def init_db(database_url=None):
+    from database import create_db_engine
+
+    engine = create_db_engine(database_url)
+    Base.metadata.create_all(engine)
+    migrate_db(engine)
+    return engine
+
+def migrate_db(engine):
+    """Add mapped columns and indexes that an existing database predates.
+
+    create_all only creates missing tables, so a database made from an older
+    schema (such as the llc_formation.db in the repo) is brought up to date
+    here with ALTER TABLE ... ADD COLUMN. New columns are all nullable, so
+    existing rows simply read them as NULL.
+    """
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            missing = [column for column in table.columns if column.name not in existing]
+            for column in missing:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} "
+                    f"{column.type.compile(engine.dialect)}"
+                )
+            if missing:
+                for index in table.indexes:
+                    index.create(conn, checkfirst=True)
 
-__all__ = ['Base', 'AIEmployee', 'AITask', 'Business']
+__all__ = [
+    'Base', 'User', 'Business', 'AIEmployee', 'AITask', 'Document',
+    'ComplianceItem', 'FinancialRecord', 'BusinessInsight', 'Notification',
+    'init_db', 'migrate_db'
+]
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from models import Base
 
 class AIEmployee(Base):
     __tablename__ = 'ai_employees'
+    __table_args__ = (
+        Index('ix_ai_employees_business_department', 'business_id', 'department'),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
@@ -20,6 +23,10 @@ class AIEmployee(Base):
 
 class AITask(Base):
     __tablename__ = 'ai_tasks'
+    __table_args__ = (
+        Index('ix_ai_tasks_employee', 'employee_id'),
+        Index('ix_ai_tasks_business_status', 'business_id', 'status'),
+    )
 
     id = Column(Integer, primary_key=True)
     title = Column(String, nullable=False)
@@ -1,20 +1,49 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from models import Base
 
 class Business(Base):
     __tablename__ = 'businesses'
+    __table_args__ = (
+        Index('ix_businesses_owner', 'owner_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     industry = Column(String, nullable=False)
     state = Column(String, nullable=False)
+    entity_type = Column(String, default='LLC')
+    formation_status = Column(String, default='pending')
+    state_filing_number = Column(String)
+    formation_date = Column(DateTime)
+    ein = Column(String)
     is_nonprofit = Column(Boolean, default=False)
     tax_classification = Column(String)
     mission_statement = Column(String)
     created_at = Column(DateTime, default=datetime.now)
-    
+    owner_id = Column(Integer, ForeignKey('users.id'))
+
+    # Business Details
+    business_address = Column(String)
+    mailing_address = Column(String)
+    owner_address = Column(String)
+    registered_agent = Column(String)
+    registered_agent_address = Column(String)
+    phone = Column(String)
+    website = Column(String)
+
+    # Formation Progress
+    formation_progress = Column(Integer, default=0)
+    is_name_available = Column(Boolean)
+    is_articles_filed = Column(Boolean, default=False)
+    is_ein_obtained = Column(Boolean, default=False)
+
+    owner = relationship("User", back_populates="businesses")
+    documents = relationship("Document", back_populates="business")
+    compliance_items = relationship("ComplianceItem", back_populates="business")
+    financial_records = relationship("FinancialRecord", back_populates="business")
+
     # Add relationship to AI employees
     ai_employees = relationship("AIEmployee", back_populates="business")
-    ai_tasks = relationship("AITask")
+    ai_tasks = relationship("AITask", back_populates="business")
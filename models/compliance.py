@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Index, text
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from models import Base
+
+class ComplianceItem(Base):
+    __tablename__ = 'compliance_items'
+    __table_args__ = (
+        # Partial index: the deadline scan only ever looks at open items
+        Index(
+            'ix_compliance_items_pending_due', 'due_date',
+            sqlite_where=text("status = 'pending'"),
+            postgresql_where=text("status = 'pending'")
+        ),
+        # Covers the per-business status counts in get_compliance_summary
+        Index('ix_compliance_items_business_status_due', 'business_id', 'status', 'due_date'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    business_id = Column(Integer, ForeignKey('businesses.id'))
+    type = Column(String, nullable=False)
+    due_date = Column(DateTime)
+    status = Column(String, default='pending')
+    description = Column(String)
+    requirements = Column(JSON)
+    notes = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    business = relationship("Business", back_populates="compliance_items")
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from models import Base
+
+class Document(Base):
+    __tablename__ = 'documents'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    type = Column(String, nullable=False)
+    status = Column(String, default='draft')
+    content = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, onupdate=datetime.utcnow)
+    owner_id = Column(Integer, ForeignKey('users.id'))
+    business_id = Column(Integer, ForeignKey('businesses.id'))
+
+    owner = relationship("User", back_populates="documents")
+    business = relationship("Business", back_populates="documents")
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from models import Base
+
+class FinancialRecord(Base):
+    __tablename__ = 'financial_records'
+    __table_args__ = (
+        Index('ix_financial_records_business_type', 'business_id', 'type'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    business_id = Column(Integer, ForeignKey('businesses.id'))
+    type = Column(String, nullable=False)
+    amount = Column(Float, nullable=False)
+    date = Column(DateTime, nullable=False)
+    category = Column(String)
+    description = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    business = relationship("Business", back_populates="financial_records")
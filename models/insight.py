@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from datetime import datetime
+from models import Base
+
+class BusinessInsight(Base):
+    __tablename__ = 'business_insights'
+
+    id = Column(Integer, primary_key=True)
+    business_id = Column(Integer, ForeignKey('businesses.id'))
+    type = Column(String, nullable=False)
+    content = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    priority = Column(Integer, default=0)
+    status = Column(String, default='active')
@@ -11,11 +11,16 @@ class User(Base):
     email = Column(String(255), unique=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
     name = Column(String(255))
+    first_name = Column(String(255))
+    last_name = Column(String(255))
     role = Column(String(50), default='user')  # 'admin' or 'user'
     created_at = Column(DateTime, default=datetime.utcnow)
     last_login = Column(DateTime)
     is_active = Column(Boolean, default=True)
 
+    businesses = relationship("Business", back_populates="owner")
+    documents = relationship("Document", back_populates="owner")
+
     def set_password(self, password):
         salt = bcrypt.gensalt()
         self.password_hash = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
@@ -1,106 +1,155 @@
 import openai
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
 from models import AIEmployee, AITask, Business
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 from datetime import datetime
-import json
-import os
-from openai import AsyncOpenAI
+import asyncio
+import orjson
+from services.openai_client import acreate_chat_completion, get_async_client
+
+_SYS_HR = {"role": "system", "content": "You are an HR expert specializing in AI workforce."}
+
+HIRE_PROMPT = """
+Create a profile for an AI employee with the following:
+Role: {role}
+Department: {department}
+Business: {business_name} ({industry})
+
+Respond with a JSON object with these keys:
+- "name": a professional name
+- "skills": a list of key skills and capabilities
+- "performance_metrics": a list of performance metrics to track
+"""
 
 class AIWorkforceService:
+    # JSON mode needs a model newer than gpt-4
+    PROFILE_MODEL = "gpt-4o"
+
     def __init__(self, session: Session):
         self.session = session
-        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = get_async_client()
 
     async def hire_employee(self, business_id: int, role: str, department: str) -> AIEmployee:
         """Hire a new AI employee with specified role and department."""
-        business = self.session.query(Business).get(business_id)
+        return (await self.hire_employees(business_id, [(role, department)]))[0]
+
+    async def hire_employees(self, business_id: int, positions: List[Tuple[str, str]]) -> List[AIEmployee]:
+        """Hire several AI employees, given as (role, department) pairs, in one commit."""
+        business = self.session.get(Business, business_id)
         if not business:
             raise ValueError(f"Business with ID {business_id} not found")
 
-        # Generate employee details using OpenAI
-        prompt = f"""
-        Create a profile for an AI employee with the following:
-        Role: {role}
-        Department: {department}
-        Business: {business.name} ({business.industry})
-
-        Include:
-        1. A professional name
-        2. Key skills and capabilities
-        3. Performance metrics to track
-        """
-
-        response = await self.client.chat.completions.create(
-            model="gpt-4",
+        profiles = await asyncio.gather(*(
+            self._generate_profile(business, role, department)
+            for role, department in positions
+        ))
+
+        employees = [
+            AIEmployee(
+                name=profile["name"],
+                role=role,
+                department=department,
+                skills=profile["skills"],
+                performance_metrics={"metrics": profile["performance_metrics"]},
+                business_id=business_id
+            )
+            for (role, department), profile in zip(positions, profiles)
+        ]
+
+        self.session.add_all(employees)
+        self.session.commit()
+        return employees
+
+    async def _generate_profile(self, business: Business, role: str, department: str) -> Dict[str, Any]:
+        """Generate employee details using OpenAI."""
+        prompt = HIRE_PROMPT.format_map({
+            "role": role,
+            "department": department,
+            "business_name": business.name,
+            "industry": business.industry
+        })
+
+        # Every hire gets its own completion, so two hires for the same role
+        # come back as different people
+        response = await acreate_chat_completion(
+            self.client,
+            model=self.PROFILE_MODEL,
             messages=[
-                {"role": "system", "content": "You are an HR expert specializing in AI workforce."},
+                _SYS_HR,
                 {"role": "user", "content": prompt}
-            ]
-        )
-
-        profile = json.loads(response.choices[0].message.content)
-
-        employee = AIEmployee(
-            name=profile["name"],
-            role=role,
-            department=department,
-            skills=profile["skills"],
-            performance_metrics={"metrics": profile["performance_metrics"]},
-            business_id=business_id
+            ],
+            response_format={"type": "json_object"}
         )
-
-        self.session.add(employee)
-        self.session.commit()
-        return employee
+        return orjson.loads(response.choices[0].message.content)
 
     async def assign_task(self, business_id: int, employee_id: int, title: str, description: str, priority: int) -> AITask:
         """Assign a task to an AI employee."""
-        employee = self.session.query(AIEmployee).get(employee_id)
-        if not employee or employee.business_id != business_id:
-            raise ValueError("Invalid employee ID or business ID")
+        return (await self.assign_tasks(business_id, [{
+            "employee_id": employee_id,
+            "title": title,
+            "description": description,
+            "priority": priority
+        }]))[0]
 
-        task = AITask(
-            title=title,
-            description=description,
-            status="pending",
-            priority=priority,
-            business_id=business_id,
-            employee_id=employee_id,
-            completion_rate=0.0,
-            metrics={}
-        )
+    async def assign_tasks(self, business_id: int, assignments: List[Dict[str, Any]]) -> List[AITask]:
+        """Assign several tasks in one commit.
+
+        Each assignment is a dict with employee_id, title, description and priority.
+        """
+        employee_ids = {a["employee_id"] for a in assignments}
+        valid_ids = {
+            row.id for row in self.session.query(AIEmployee.id).filter(
+                AIEmployee.id.in_(employee_ids),
+                AIEmployee.business_id == business_id
+            )
+        }
+        if valid_ids != employee_ids:
+            raise ValueError("Invalid employee ID or business ID")
 
-        self.session.add(task)
+        tasks = [
+            AITask(
+                title=a["title"],
+                description=a["description"],
+                status="pending",
+                priority=a["priority"],
+                business_id=business_id,
+                employee_id=a["employee_id"],
+                completion_rate=0.0,
+                metrics={}
+            )
+            for a in assignments
+        ]
+
+        self.session.add_all(tasks)
         self.session.commit()
-        return task
+        return tasks
 
     async def analyze_department_performance(self, business_id: int) -> Dict[str, Any]:
         """Analyze performance metrics for all departments."""
-        business = self.session.query(Business).get(business_id)
-        if not business:
+        if self.session.query(Business.id).filter_by(id=business_id).scalar() is None:
             raise ValueError(f"Business with ID {business_id} not found")
 
-        departments = {}
-        employees = self.session.query(AIEmployee).filter_by(business_id=business_id).all()
-
-        for employee in employees:
-            if employee.department not in departments:
-                departments[employee.department] = {
-                    "employee_count": 0,
-                    "completed_tasks": 0,
-                    "total_tasks": 0,
-                    "average_completion_rate": 0.0
-                }
-
-            dept = departments[employee.department]
-            dept["employee_count"] += 1
-
-            tasks = self.session.query(AITask).filter_by(employee_id=employee.id).all()
-            dept["total_tasks"] += len(tasks)
-            dept["completed_tasks"] += len([t for t in tasks if t.status == "completed"])
-            completion_rates = [t.completion_rate for t in tasks if t.completion_rate is not None]
-            if completion_rates:
-                dept["average_completion_rate"] = sum(completion_rates) / len(completion_rates)
-
-        return departments
+        rows = (
+            self.session.query(
+                AIEmployee.department,
+                func.count(func.distinct(AIEmployee.id)).label("employee_count"),
+                func.count(AITask.id).label("total_tasks"),
+                func.sum(case((AITask.status == "completed", 1), else_=0)).label("completed_tasks"),
+                func.avg(AITask.completion_rate).label("average_completion_rate")
+            )
+            .outerjoin(AITask, AITask.employee_id == AIEmployee.id)
+            .filter(AIEmployee.business_id == business_id)
+            .group_by(AIEmployee.department)
+            .all()
+        )
+
+        return {
+            row.department: {
+                "employee_count": row.employee_count,
+                "completed_tasks": int(row.completed_tasks or 0),
+                "total_tasks": row.total_tasks,
+                "average_completion_rate": float(row.average_completion_rate or 0.0)
+            }
+            for row in rows
+        }
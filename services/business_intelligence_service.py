@@ -1,37 +1,89 @@
-import openai
 from datetime import datetime
 from models import BusinessInsight, Business, FinancialRecord
 from sqlalchemy import func
+from services import insight_cache
+from services.openai_client import acreate_chat_completion, completion_flight, get_async_client
+
+_SYS_MARKET = {"role": "system", "content": "You are a business analyst expert."}
+_SYS_FINANCIAL = {"role": "system", "content": "You are a financial analyst expert."}
+_SYS_STRATEGY = {"role": "system", "content": "You are a business strategy expert."}
+
+MARKET_ANALYSIS_PROMPT = """
+Provide a detailed market analysis for a {industry} business in {state}.
+Include:
+1. Market size and growth potential
+2. Key competitors
+3. Target customer demographics
+4. Industry trends
+5. Potential challenges and opportunities
+"""
+
+FINANCIAL_INSIGHTS_PROMPT = """
+Analyze the following financial metrics and provide strategic insights:
+- Total Revenue: ${total_revenue:,.2f}
+- Average Transaction: ${avg_transaction:,.2f}
+- Transaction Count: {transaction_count}
+
+Provide:
+1. Performance analysis
+2. Growth opportunities
+3. Cost optimization suggestions
+4. Revenue improvement strategies
+"""
+
+GROWTH_RECOMMENDATIONS_PROMPT = """
+Provide strategic growth recommendations for a {industry} business with:
+Revenue: ${total_revenue:,.2f}
+Market Position: {market_position}
+State: {state}
+
+Include:
+1. Short-term growth tactics
+2. Long-term strategic initiatives
+3. Resource allocation suggestions
+4. Risk mitigation strategies
+"""
 
 class BusinessIntelligenceService:
     def __init__(self, db_session):
         self.db_session = db_session
-
-    def generate_market_analysis(self, business_id):
+        self.client = get_async_client()
+
+    async def _complete(self, system_message, prompt, model="gpt-3.5-turbo"):
+        """Return a chat completion, reusing cached content for identical prompts."""
+        key = insight_cache.make_key(model, system_message["content"], prompt)
+        content = insight_cache.get(key)
+        if content is not None:
+            return content
+
+        async def _fetch():
+            response = await acreate_chat_completion(
+                self.client,
+                model=model,
+                messages=[
+                    system_message,
+                    {"role": "user", "content": prompt}
+                ]
+            )
+            content = response.choices[0].message.content
+            insight_cache.put(key, content)
+            return content
+
+        # Identical prompts arriving together share a single OpenAI call
+        return await completion_flight.do(key, _fetch)
+
+    async def generate_market_analysis(self, business_id):
         """Generate market analysis using OpenAI."""
-        business = self.db_session.query(Business).get(business_id)
+        business = self.db_session.get(Business, business_id)
         if not business:
             raise ValueError("Business not found")
 
-        prompt = f"""
-        Provide a detailed market analysis for a {business.industry} business in {business.state}.
-        Include:
-        1. Market size and growth potential
-        2. Key competitors
-        3. Target customer demographics
-        4. Industry trends
-        5. Potential challenges and opportunities
-        """
-
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a business analyst expert."},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        prompt = MARKET_ANALYSIS_PROMPT.format_map({
+            "industry": business.industry,
+            "state": business.state
+        })
 
-        analysis = response.choices[0].message.content
+        analysis = await self._complete(_SYS_MARKET, prompt)
 
         insight = BusinessInsight(
             business_id=business_id,
@@ -47,10 +99,10 @@ class BusinessIntelligenceService:
         self.db_session.commit()
         return insight
 
-    def generate_financial_insights(self, business_id):
+    async def generate_financial_insights(self, business_id):
         """Generate financial insights based on business records."""
-        business = self.db_session.query(Business).get(business_id)
-        if not business:
+        # Only existence matters here; skip hydrating the full Business row
+        if self.db_session.query(Business.id).filter_by(id=business_id).scalar() is None:
             raise ValueError("Business not found")
 
         # Calculate key financial metrics
@@ -64,28 +116,13 @@ class BusinessIntelligenceService:
         ).first()
 
         # Generate insights using OpenAI
-        prompt = f"""
-        Analyze the following financial metrics and provide strategic insights:
-        - Total Revenue: ${financial_data.total_revenue or 0:,.2f}
-        - Average Transaction: ${financial_data.avg_transaction or 0:,.2f}
-        - Transaction Count: {financial_data.transaction_count or 0}
-
-        Provide:
-        1. Performance analysis
-        2. Growth opportunities
-        3. Cost optimization suggestions
-        4. Revenue improvement strategies
-        """
-
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a financial analyst expert."},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        prompt = FINANCIAL_INSIGHTS_PROMPT.format_map({
+            "total_revenue": financial_data.total_revenue or 0,
+            "avg_transaction": financial_data.avg_transaction or 0,
+            "transaction_count": financial_data.transaction_count or 0
+        })
 
-        analysis = response.choices[0].message.content
+        analysis = await self._complete(_SYS_FINANCIAL, prompt)
 
         insight = BusinessInsight(
             business_id=business_id,
@@ -106,9 +143,9 @@ class BusinessIntelligenceService:
         self.db_session.commit()
         return insight
 
-    def generate_growth_recommendations(self, business_id):
+    async def generate_growth_recommendations(self, business_id):
         """Generate personalized growth recommendations."""
-        business = self.db_session.query(Business).get(business_id)
+        business = self.db_session.get(Business, business_id)
         if not business:
             raise ValueError("Business not found")
 
@@ -116,28 +153,14 @@ class BusinessIntelligenceService:
         financial_metrics = self.get_financial_metrics(business_id)
         market_position = self.analyze_market_position(business)
 
-        prompt = f"""
-        Provide strategic growth recommendations for a {business.industry} business with:
-        Revenue: ${financial_metrics['total_revenue']:,.2f}
-        Market Position: {market_position}
-        State: {business.state}
-
-        Include:
-        1. Short-term growth tactics
-        2. Long-term strategic initiatives
-        3. Resource allocation suggestions
-        4. Risk mitigation strategies
-        """
-
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a business strategy expert."},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        prompt = GROWTH_RECOMMENDATIONS_PROMPT.format_map({
+            "industry": business.industry,
+            "total_revenue": financial_metrics['total_revenue'],
+            "market_position": market_position,
+            "state": business.state
+        })
 
-        recommendations = response.choices[0].message.content
+        recommendations = await self._complete(_SYS_STRATEGY, prompt)
 
         insight = BusinessInsight(
             business_id=business_id,
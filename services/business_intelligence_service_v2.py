@@ -1,53 +1,355 @@
+import asyncio
 from datetime import datetime, timedelta
 import openai
 import numpy as np
-from typing import Dict, List, Any
-from models import Business
-from sqlalchemy import func
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from models import Business, ComplianceItem
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.cluster import KMeans
-import json
+from sklearn.cluster import MiniBatchKMeans
+import orjson
 import os
-from openai import AsyncOpenAI
+from services import insight_cache
+from services.openai_client import (
+    MAX_CONCURRENT_COMPLETIONS, OpenAIThrottle, completion_flight, default_throttle, get_async_client
+)
+
+# (industry, state) pairs sent in one benchmark prompt
+BENCHMARK_BATCH_SIZE = 50
+
+def _is_json(content: str) -> bool:
+    try:
+        orjson.loads(content)
+    except orjson.JSONDecodeError:
+        return False
+    return True
 
 class EnhancedBusinessIntelligenceService:
-    def __init__(self, session: Session):
+    ANALYSIS_MODEL = os.getenv("BI_ANALYSIS_MODEL", "gpt-4o-mini")
+
+    # Structured output keeps analyze_business responses parseable without post-processing
+    _ANALYSIS_RESPONSE_FORMAT = {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "BusinessAnalysis",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "market_opportunities": {"type": "array", "items": {"type": "string"}},
+                    "challenges": {"type": "array", "items": {"type": "string"}},
+                    "growth_strategies": {"type": "array", "items": {"type": "string"}},
+                    "kpis": {"type": "array", "items": {"type": "string"}}
+                },
+                "required": ["market_opportunities", "challenges", "growth_strategies", "kpis"],
+                "additionalProperties": False
+            }
+        }
+    }
+
+    # A cap on output bounds latency; a truncated reply goes through _repair_json
+    _ANALYSIS_OPTIONS = {
+        "response_format": _ANALYSIS_RESPONSE_FORMAT,
+        "max_tokens": 800,
+        "temperature": 0.2
+    }
+    REPAIR_MODEL = "gpt-4o-mini"
+    # The repair rewrites a reply that may already have hit the analysis cap,
+    # so it gets room to finish the JSON
+    _REPAIR_OPTIONS = {
+        "response_format": _ANALYSIS_RESPONSE_FORMAT,
+        "max_tokens": 2000,
+        "temperature": 0
+    }
+
+    # Risks identified for one category, and a mitigation per risk
+    _RISKS_RESPONSE_FORMAT = {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "RiskList",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "risks": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "type": {"type": "string"},
+                                "severity": {"type": "string", "enum": ["low", "medium", "high"]},
+                                "description": {"type": "string"}
+                            },
+                            "required": ["type", "severity", "description"],
+                            "additionalProperties": False
+                        }
+                    }
+                },
+                "required": ["risks"],
+                "additionalProperties": False
+            }
+        }
+    }
+    _MITIGATION_RESPONSE_FORMAT = {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "MitigationStrategies",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "strategies": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "risk_type": {"type": "string"},
+                                "strategy": {"type": "string"}
+                            },
+                            "required": ["risk_type", "strategy"],
+                            "additionalProperties": False
+                        }
+                    }
+                },
+                "required": ["strategies"],
+                "additionalProperties": False
+            }
+        }
+    }
+
+    # Points each risk adds to the 0-100 risk score, by severity
+    _SEVERITY_POINTS = {"low": 5, "medium": 10, "high": 20}
+
+    _BENCHMARK_CATEGORIES = ("financial", "operational", "growth")
+
+    # Recommendation for each (category, metric) that falls below its benchmark
+    _RECS = {
+        ("financial", "revenue"): "Consider strategies to increase revenue streams, such as expanding product lines or entering new markets",
+        ("financial", "profit_margin"): "Focus on improving profit margins through cost optimization and pricing strategies",
+        ("financial", "operating_costs"): "Review and optimize operational costs to align with industry standards",
+        ("operational", "customer_satisfaction"): "Implement customer feedback programs to improve satisfaction scores",
+        ("operational", "employee_satisfaction"): "Review employee engagement initiatives and workplace culture",
+        ("operational", "project_completion_rate"): "Analyze project management processes for efficiency improvements",
+        ("growth", "revenue_growth"): "Develop strategies to accelerate revenue growth through market expansion",
+        ("growth", "customer_growth"): "Focus on customer acquisition and retention strategies",
+        ("growth", "market_share_growth"): "Consider competitive positioning and market penetration strategies",
+    }
+    _RECS_DF = pd.DataFrame(
+        [(category, metric, text) for (category, metric), text in _RECS.items()],
+        columns=["category", "metric", "recommendation"]
+    )
+
+    _ANALYSIS_PROMPT = """
+Analyze the following business:
+Name: {name}
+Industry: {industry}
+State: {state}
+Type: {business_type}
+Mission: {mission}
+
+Provide a comprehensive analysis including:
+1. Market opportunities
+2. Potential challenges
+3. Growth strategies
+4. Key performance indicators
+"""
+
+    _BENCHMARK_PROMPT = """Generate realistic industry benchmarks for {industry} businesses in {state}, including:
+1. Financial ratios
+2. Operational metrics
+3. Growth rates
+4. Market share statistics"""
+
+    _BENCHMARK_BATCH_PROMPT = """Generate realistic industry benchmarks for each of the following segments:
+{listing}
+
+Respond with a JSON object {{"benchmarks": [...]}} holding one entry per segment, in the same order.
+Each entry must have "financial", "operational" and "growth" objects of numeric metrics."""
+
+    _RISK_PROMPT = """Identify the main {category} risks for a {business_type} {industry} business in {state},
+considering {considerations}.
+Give each risk a short type, a severity of low, medium or high, and a one-sentence description."""
+
+    _MITIGATION_PROMPT = """Suggest one practical mitigation strategy for each of these risks:
+{listing}"""
+
+    _COMPETITIVE_PROMPT = """Analyze the competitive position for a {industry} business in {state}, considering:
+1. Market opportunities
+2. Competitive threats
+3. Strategic recommendations"""
+
+    _FUNDING_PROMPT_NP = """Analyze funding opportunities for a {industry} non-profit organization in {state}.
+Consider:
+1. Grants and charitable foundations
+2. Individual donor strategies
+3. Corporate sponsorships
+4. Crowdfunding opportunities
+5. Tax implications and benefits"""
+
+    _FUNDING_PROMPT_FP = """Analyze funding opportunities for a {industry} for-profit organization in {state}.
+Consider:
+1. Venture capital and angel investors
+2. Bank loans and credit lines
+3. Revenue-based financing
+4. Crowdfunding opportunities
+5. Tax implications and benefits"""
+
+    _SYS_ANALYSIS = {"role": "system", "content": "You are a business intelligence expert."}
+    _SYS_BENCHMARKS = {"role": "system", "content": "You are a business analytics expert."}
+    _SYS_STRATEGY = {"role": "system", "content": "You are a business strategy expert."}
+    _SYS_FUNDING = {"role": "system", "content": "You are a financial advisor specializing in organizational funding."}
+    _SYS_REPAIR = {
+        "role": "system",
+        "content": (
+            "Rewrite the user's text as valid JSON with the keys market_opportunities, "
+            "challenges, growth_strategies and kpis, each a list of strings. Return only the JSON."
+        )
+    }
+
+    def __init__(self, session: Session, max_requests_per_minute: Optional[int] = None,
+                 max_tokens_per_minute: Optional[int] = None):
         self.session = session
-        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = get_async_client()
+        self._completion_slots = asyncio.Semaphore(MAX_CONCURRENT_COMPLETIONS)
+        if max_requests_per_minute or max_tokens_per_minute:
+            self._throttle = OpenAIThrottle(
+                max_requests_per_minute or default_throttle.max_requests_per_minute,
+                max_tokens_per_minute or default_throttle.max_tokens_per_minute
+            )
+        else:
+            self._throttle = default_throttle
+
+    @staticmethod
+    def _completion_key(messages: List[Dict[str, str]], model: str, kwargs: Dict[str, Any]) -> str:
+        return insight_cache.make_key(
+            model,
+            orjson.dumps(messages, option=orjson.OPT_SORT_KEYS).decode(),
+            orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS).decode()
+        )
 
-    async def analyze_business(self, business_id: int) -> Dict[str, Any]:
-        business = self.session.query(Business).get(business_id)
-        if not business:
+    async def _cached_completion(self, messages: List[Dict[str, str]], model: str, *,
+                                 cacheable: Optional[Callable[[str], bool]] = None, **kwargs) -> str:
+        """Return completion content, reusing a stored result for identical requests.
+
+        When cacheable is given, only content it accepts is stored.
+        """
+        key = self._completion_key(messages, model, kwargs)
+        content = insight_cache.get(key)
+        if content is not None:
+            return content
+
+        async def _fetch():
+            async with self._completion_slots:
+                response = await self._throttle.submit(self.client, model=model, messages=messages, **kwargs)
+            content = response.choices[0].message.content
+            if cacheable is None or cacheable(content):
+                insight_cache.put(key, content)
+            return content
+
+        return await completion_flight.do(key, _fetch)
+
+    def _load_businesses(self, business_ids: List[int]) -> Dict[int, Business]:
+        """Load several businesses in one query.
+
+        The rows land in the session's identity map, so later _get_business()
+        calls for the same ids are served without another round trip.
+        """
+        rows = self.session.execute(
+            select(Business).where(Business.id.in_(business_ids))
+        ).scalars().all()
+        return {business.id: business for business in rows}
+
+    def _get_business(self, business_id: int) -> Business:
+        """Return the business with business_id, raising ValueError when it doesn't exist.
+
+        session.get() checks the identity map first, so businesses preloaded
+        by _load_businesses cost no query.
+        """
+        business = self.session.get(Business, business_id)
+        if business is None:
             raise ValueError(f"Business with ID {business_id} not found")
+        return business
+
+    async def analyze_businesses(self, business_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Analyze a portfolio of businesses, loading them up front in one query."""
+        businesses = self._load_businesses(business_ids)
+        missing = set(business_ids) - businesses.keys()
+        if missing:
+            raise ValueError(f"Business with ID {min(missing)} not found")
+
+        analyses = await asyncio.gather(*(self.analyze_business(business_id) for business_id in businesses))
+        return dict(zip(businesses, analyses))
+
+    def _analysis_messages(self, business: Business) -> List[Dict[str, str]]:
+        prompt = self._ANALYSIS_PROMPT.format(
+            name=business.name,
+            industry=business.industry,
+            state=business.state,
+            business_type="Non-Profit" if business.is_nonprofit else "For-Profit",
+            mission=business.mission_statement
+        )
+        return [self._SYS_ANALYSIS, {"role": "user", "content": prompt}]
+
+    async def analyze_business(self, business_id: int) -> Dict[str, Any]:
+        business = self._get_business(business_id)
 
         # Generate analysis using OpenAI
-        prompt = f"""
-        Analyze the following business:
-        Name: {business.name}
-        Industry: {business.industry}
-        State: {business.state}
-        Type: {"Non-Profit" if business.is_nonprofit else "For-Profit"}
-        Mission: {business.mission_statement}
-
-        Provide a comprehensive analysis including:
-        1. Market opportunities
-        2. Potential challenges
-        3. Growth strategies
-        4. Key performance indicators
-        """
+        content = await self._cached_completion(
+            self._analysis_messages(business),
+            model=self.ANALYSIS_MODEL,
+            cacheable=_is_json,
+            **self._ANALYSIS_OPTIONS
+        )
 
-        response = await self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a business intelligence expert."},
-                {"role": "user", "content": prompt}
-            ]
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return await self._repair_json(content)
+
+    async def _repair_json(self, content: str) -> Dict[str, Any]:
+        """Ask a small model to turn a malformed analysis into valid JSON, once."""
+        repaired = await self._cached_completion(
+            [self._SYS_REPAIR, {"role": "user", "content": content}],
+            model=self.REPAIR_MODEL,
+            cacheable=_is_json,
+            **self._REPAIR_OPTIONS
         )
+        try:
+            return orjson.loads(repaired)
+        except orjson.JSONDecodeError:
+            return {"error": "Analysis could not be parsed"}
+
+    async def stream_business_analysis(self, business_id: int) -> AsyncIterator[str]:
+        """Yield the business analysis as it is generated.
 
-        analysis = response.choices[0].message.content
-        return json.loads(analysis) if isinstance(analysis, str) else analysis
+        The assembled text is cached under the same key as analyze_business, so
+        a later non-streaming call for the business is served from the cache.
+        """
+        business = self._get_business(business_id)
+
+        messages = self._analysis_messages(business)
+        options = self._ANALYSIS_OPTIONS
+        key = self._completion_key(messages, self.ANALYSIS_MODEL, options)
+        cached = insight_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        async with self._completion_slots:
+            stream = await self._throttle.submit(
+                self.client, model=self.ANALYSIS_MODEL, messages=messages, stream=True, **options
+            )
+            async for event in stream:
+                delta = event.choices[0].delta.content if event.choices else None
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+        content = "".join(chunks)
+        # Only a complete analysis is stored, so analyze_business can parse it
+        if _is_json(content):
+            insight_cache.put(key, content)
 
     async def perform_customer_segmentation(self, business_id: int) -> Dict:
         """Perform customer segmentation analysis."""
@@ -76,53 +378,64 @@ class EnhancedBusinessIntelligenceService:
         """Prepare customer transaction data for segmentation."""
         # Convert transactions to DataFrame
         df = pd.DataFrame(transactions)
-        
-        # Calculate customer metrics
-        customer_metrics = df.groupby('customer_id').agg({
-            'amount': ['sum', 'mean', 'count'],
-            'date': ['min', 'max']
-        })
-        
-        # Calculate recency, frequency, monetary value
-        now = datetime.now()
-        customer_metrics['recency'] = (now - customer_metrics['date']['max']).dt.days
-        customer_metrics['frequency'] = customer_metrics['amount']['count']
-        customer_metrics['monetary'] = customer_metrics['amount']['sum']
-        
-        # Normalize features
-        scaler = MinMaxScaler()
-        features = scaler.fit_transform(customer_metrics[['recency', 'frequency', 'monetary']])
-        
+        amounts = df['amount'].to_numpy(dtype=np.float64)
+        dates = df['date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+        # Calculate recency, frequency, monetary value per customer code in single passes
+        codes, customers = pd.factorize(df['customer_id'], sort=False)
+        n_customers = len(customers)
+        monetary = np.bincount(codes, weights=amounts, minlength=n_customers)
+        frequency = np.bincount(codes, minlength=n_customers)
+        last_date = np.full(n_customers, np.iinfo(np.int64).min)
+        np.maximum.at(last_date, codes, dates)
+        now = np.datetime64(datetime.now(), 'ns').astype(np.int64)
+        recency = (now - last_date) // np.int64(86_400_000_000_000)
+
+        # Min-max normalize each column to [0, 1]; constant columns become 0
+        features = np.column_stack((recency, frequency, monetary)).astype(np.float64)
+        mins = features.min(axis=0)
+        features -= mins
+        features /= np.maximum(features.max(axis=0), 1e-12)
+
         return pd.DataFrame(features, columns=['recency', 'frequency', 'monetary'])
 
     def _cluster_customers(self, features: pd.DataFrame) -> Dict:
         """Perform customer clustering."""
         # Determine optimal number of clusters
         n_clusters = min(5, len(features))
-        
-        # Perform k-means clustering
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-        clusters = kmeans.fit_predict(features)
-        
-        # Analyze clusters
-        cluster_analysis = []
-        for i in range(n_clusters):
-            cluster_features = features[clusters == i]
-            cluster_analysis.append({
+        if n_clusters == 0:
+            return []
+
+        X = features[['recency', 'frequency', 'monetary']].to_numpy(dtype=np.float64)
+
+        # Mini-batch k-means converges in far fewer passes than full KMeans on large inputs
+        if n_clusters == 1:
+            clusters = np.zeros(len(X), dtype=np.intp)
+        else:
+            kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=4096, n_init=3, random_state=42)
+            clusters = kmeans.fit_predict(X)
+
+        # Per-cluster sizes and means without a Python loop over rows
+        sizes = np.bincount(clusters, minlength=n_clusters)
+        sums = np.zeros((n_clusters, X.shape[1]))
+        np.add.at(sums, clusters, X)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / sizes[:, None]
+
+        return [
+            {
                 "segment_id": i,
-                "size": len(cluster_features),
-                "avg_recency": cluster_features['recency'].mean(),
-                "avg_frequency": cluster_features['frequency'].mean(),
-                "avg_monetary": cluster_features['monetary'].mean()
-            })
-        
-        return cluster_analysis
+                "size": int(sizes[i]),
+                "avg_recency": means[i, 0],
+                "avg_frequency": means[i, 1],
+                "avg_monetary": means[i, 2]
+            }
+            for i in range(n_clusters)
+        ]
 
     async def generate_growth_strategy(self, business_id: int) -> Dict:
         """Generate comprehensive growth strategy."""
-        business = self.session.query(Business).get(business_id)
-        if not business:
-            raise ValueError("Business not found")
+        business = self._get_business(business_id)
 
         # Analyze current performance
         performance = self._analyze_business_performance(business_id)
@@ -182,15 +495,15 @@ class EnhancedBusinessIntelligenceService:
 
     async def generate_risk_assessment(self, business_id: int) -> Dict:
         """Generate comprehensive risk assessment."""
-        business = self.session.query(Business).get(business_id)
-        if not business:
-            raise ValueError("Business not found")
+        business = self._get_business(business_id)
 
-        # Analyze different risk categories
+        # Analyze different risk categories; the model-backed ones run concurrently
         financial_risks = self._assess_financial_risks(business_id)
-        market_risks = self._assess_market_risks(business)
-        operational_risks = self._assess_operational_risks(business)
         compliance_risks = self._assess_compliance_risks(business)
+        market_risks, operational_risks = await asyncio.gather(
+            self._assess_market_risks(business),
+            self._assess_operational_risks(business)
+        )
         
         # Generate mitigation strategies
         strategies = await self._generate_risk_mitigation_strategies({
@@ -220,7 +533,7 @@ class EnhancedBusinessIntelligenceService:
         risks = []
         
         # Assess cash flow risk
-        if metrics.get('cash_flow_ratio', 0) < 1.0:
+        if metrics.get('cash_flow_ratio', 1.0) < 1.0:
             risks.append({
                 "type": "cash_flow",
                 "severity": "high",
@@ -239,11 +552,96 @@ class EnhancedBusinessIntelligenceService:
         
         return risks
 
+    async def _assess_market_risks(self, business: Business) -> List[Dict]:
+        """Assess market risks for the business's industry and state with the model."""
+        return await self._assess_model_risks(
+            business, "market", "demand, competition, pricing and economic conditions"
+        )
+
+    async def _assess_operational_risks(self, business: Business) -> List[Dict]:
+        """Assess operational risks for the business's industry and state with the model."""
+        return await self._assess_model_risks(
+            business, "operational", "staffing, suppliers, processes and technology"
+        )
+
+    async def _assess_model_risks(self, business: Business, category: str, considerations: str) -> List[Dict]:
+        prompt = self._RISK_PROMPT.format(
+            category=category,
+            business_type="non-profit" if business.is_nonprofit else "for-profit",
+            industry=business.industry,
+            state=business.state,
+            considerations=considerations
+        )
+
+        content = await self._cached_completion(
+            [
+                self._SYS_ANALYSIS,
+                {"role": "user", "content": prompt}
+            ],
+            model=self.ANALYSIS_MODEL,
+            cacheable=_is_json,
+            response_format=self._RISKS_RESPONSE_FORMAT,
+            temperature=0.2
+        )
+
+        return orjson.loads(content)["risks"]
+
+    def _assess_compliance_risks(self, business: Business) -> List[Dict]:
+        """Flag the business's pending compliance items that are overdue or due within 30 days."""
+        now = datetime.utcnow()
+        items = self.session.execute(
+            select(ComplianceItem.type, ComplianceItem.description, ComplianceItem.due_date).where(
+                ComplianceItem.business_id == business.id,
+                ComplianceItem.status == 'pending',
+                ComplianceItem.due_date <= now + timedelta(days=30)
+            ).order_by(ComplianceItem.due_date)
+        ).all()
+
+        return [
+            {
+                "type": item.type,
+                "severity": "high" if item.due_date < now else "medium",
+                "description": item.description or f"{item.type} is due",
+                "metrics": {"due_date": item.due_date.isoformat()}
+            }
+            for item in items
+        ]
+
+    async def _generate_risk_mitigation_strategies(self, risks: Dict[str, List[Dict]]) -> List[Dict]:
+        """Suggest a mitigation for each identified risk, in one completion."""
+        listing = "\n".join(
+            f"- {category} / {risk['type']} ({risk['severity']}): {risk['description']}"
+            for category, category_risks in risks.items()
+            for risk in category_risks
+        )
+        if not listing:
+            return []
+
+        content = await self._cached_completion(
+            [
+                self._SYS_STRATEGY,
+                {"role": "user", "content": self._MITIGATION_PROMPT.format(listing=listing)}
+            ],
+            model=self.ANALYSIS_MODEL,
+            cacheable=_is_json,
+            response_format=self._MITIGATION_RESPONSE_FORMAT,
+            temperature=0.2
+        )
+
+        return orjson.loads(content)["strategies"]
+
+    def _calculate_risk_score(self, *risk_groups: List[Dict]) -> int:
+        """Score overall risk from 0 to 100 by adding up each risk's severity points."""
+        points = sum(
+            self._SEVERITY_POINTS.get(risk["severity"], 0)
+            for risks in risk_groups
+            for risk in risks
+        )
+        return min(points, 100)
+
     async def generate_industry_benchmarks(self, business_id: int) -> Dict:
         """Generate industry benchmarks and comparative analysis."""
-        business = self.session.query(Business).get(business_id)
-        if not business:
-            raise ValueError("Business not found")
+        business = self._get_business(business_id)
 
         # Get business metrics
         metrics = self._get_business_metrics(business_id)
@@ -257,16 +655,53 @@ class EnhancedBusinessIntelligenceService:
         return {
             "business_metrics": metrics,
             "industry_benchmarks": benchmarks,
-            "comparison": comparison,
+            "comparison": comparison.to_dict("records"),
             "recommendations": self._generate_benchmark_recommendations(comparison)
         }
 
+    async def generate_industry_benchmarks_batch(self, business_ids: List[int]) -> Dict[int, Dict]:
+        """Generate benchmark comparisons for several businesses with shared benchmark prompts."""
+        businesses = list(self._load_businesses(business_ids).values())
+        missing = set(business_ids) - {business.id for business in businesses}
+        if missing:
+            raise ValueError(f"Business with ID {min(missing)} not found")
+
+        pairs = list(dict.fromkeys((b.industry, b.state) for b in businesses))
+        benchmarks = dict(zip(pairs, await self._get_industry_benchmarks_batch(pairs)))
+
+        all_metrics = self._get_business_metrics_batch([business.id for business in businesses])
+
+        results = {}
+        for business in businesses:
+            metrics = all_metrics[business.id]
+            business_benchmarks = benchmarks[(business.industry, business.state)]
+            comparison = self._compare_with_benchmarks(metrics, business_benchmarks)
+            results[business.id] = {
+                "business_metrics": metrics,
+                "industry_benchmarks": business_benchmarks,
+                "comparison": comparison.to_dict("records"),
+                "recommendations": self._generate_benchmark_recommendations(comparison)
+            }
+        return results
+
     def _get_business_metrics(self, business_id: int) -> Dict:
         """Calculate comprehensive business metrics."""
+        return self._get_business_metrics_batch([business_id])[business_id]
+
+    def _get_business_metrics_batch(self, business_ids: List[int]) -> Dict[int, Dict]:
+        """Calculate comprehensive metrics for several businesses, keyed by id.
+
+        All three metric groups are assembled here in one pass, so once they
+        are backed by real data this is the single place to fetch them with
+        one query for the whole batch.
+        """
         return {
-            "financial": self._get_financial_metrics(business_id),
-            "operational": self._get_operational_metrics(business_id),
-            "growth": self._get_growth_metrics(business_id)
+            business_id: {
+                "financial": self._get_financial_metrics(business_id),
+                "operational": self._get_operational_metrics(business_id),
+                "growth": self._get_growth_metrics(business_id)
+            }
+            for business_id in business_ids
         }
 
     def _get_operational_metrics(self, business_id: int) -> Dict:
@@ -286,21 +721,47 @@ class EnhancedBusinessIntelligenceService:
         """Get industry benchmarks from various sources."""
         # This would typically integrate with industry databases
         # For now, using OpenAI to generate realistic benchmarks
-        prompt = f"""Generate realistic industry benchmarks for {industry} businesses in {state}, including:
-        1. Financial ratios
-        2. Operational metrics
-        3. Growth rates
-        4. Market share statistics"""
+        prompt = self._BENCHMARK_PROMPT.format(industry=industry, state=state)
 
-        response = await self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a business analytics expert."},
+        content = await self._cached_completion(
+            [
+                self._SYS_BENCHMARKS,
                 {"role": "user", "content": prompt}
-            ]
+            ],
+            model="gpt-3.5-turbo"
         )
 
-        return self._parse_benchmarks(response.choices[0].message.content)
+        return self._parse_benchmarks(content)
+
+    async def _get_industry_benchmarks_batch(self, pairs: List[Tuple[str, str]]) -> List[Dict]:
+        """Get benchmarks for many (industry, state) pairs, one prompt per batch.
+
+        Results are aligned with pairs by index.
+        """
+        batches = [pairs[i:i + BENCHMARK_BATCH_SIZE] for i in range(0, len(pairs), BENCHMARK_BATCH_SIZE)]
+        results = await asyncio.gather(*(self._request_benchmark_batch(batch) for batch in batches))
+        return [benchmarks for batch in results for benchmarks in batch]
+
+    async def _request_benchmark_batch(self, pairs: List[Tuple[str, str]]) -> List[Dict]:
+        listing = "\n".join(
+            f"{i}. {industry} businesses in {state}" for i, (industry, state) in enumerate(pairs, 1)
+        )
+        prompt = self._BENCHMARK_BATCH_PROMPT.format(listing=listing)
+
+        content = await self._cached_completion(
+            [
+                self._SYS_BENCHMARKS,
+                {"role": "user", "content": prompt}
+            ],
+            model="gpt-3.5-turbo",
+            response_format={"type": "json_object"}
+        )
+
+        entries = orjson.loads(content).get("benchmarks", [])
+        return [
+            entries[i] if i < len(entries) and isinstance(entries[i], dict) else self._parse_benchmarks(content)
+            for i in range(len(pairs))
+        ]
 
     def _parse_benchmarks(self, content: str) -> Dict:
         """Parse industry benchmarks from OpenAI response."""
@@ -324,112 +785,57 @@ class EnhancedBusinessIntelligenceService:
             }
         }
 
-    def _compare_with_benchmarks(self, metrics: Dict, benchmarks: Dict) -> Dict:
-        """Compare business metrics with industry benchmarks."""
-        comparisons = {}
-        
-        # Compare financial metrics
-        if "financial" in metrics and "financial" in benchmarks:
-            financial_comparison = {}
-            for key in metrics["financial"]:
-                if key in benchmarks["financial"]:
-                    business_value = metrics["financial"][key]
-                    benchmark_value = benchmarks["financial"][key]
-                    financial_comparison[key] = {
-                        "business_value": business_value,
-                        "benchmark_value": benchmark_value,
-                        "difference": business_value - benchmark_value if isinstance(business_value, (int, float)) else "N/A",
-                        "performance": "Above Average" if business_value > benchmark_value else "Below Average" if business_value < benchmark_value else "Average"
-                    }
-            comparisons["financial"] = financial_comparison
-        
-        # Compare operational metrics
-        if "operational" in metrics and "operational" in benchmarks:
-            operational_comparison = {}
-            for key in metrics["operational"]:
-                if key in benchmarks["operational"]:
-                    business_value = metrics["operational"][key]
-                    benchmark_value = benchmarks["operational"][key]
-                    operational_comparison[key] = {
-                        "business_value": business_value,
-                        "benchmark_value": benchmark_value,
-                        "difference": business_value - benchmark_value if isinstance(business_value, (int, float)) else "N/A",
-                        "performance": "Above Average" if business_value > benchmark_value else "Below Average" if business_value < benchmark_value else "Average"
-                    }
-            comparisons["operational"] = operational_comparison
-        
-        # Compare growth metrics
-        if "growth" in metrics and "growth" in benchmarks:
-            growth_comparison = {}
-            for key in metrics["growth"]:
-                if key in benchmarks["growth"]:
-                    business_value = metrics["growth"][key]
-                    benchmark_value = benchmarks["growth"][key]
-                    growth_comparison[key] = {
-                        "business_value": business_value,
-                        "benchmark_value": benchmark_value,
-                        "difference": business_value - benchmark_value if isinstance(business_value, (int, float)) else "N/A",
-                        "performance": "Above Average" if business_value > benchmark_value else "Below Average" if business_value < benchmark_value else "Average"
-                    }
-            comparisons["growth"] = growth_comparison
-        
-        return comparisons
+    def _compare_with_benchmarks(self, metrics: Dict, benchmarks: Dict) -> pd.DataFrame:
+        """Compare business metrics with industry benchmarks.
+
+        Returns one row per metric present on both sides, with columns
+        category, metric, business_value, benchmark_value, difference and
+        performance.
+        """
+        rows = [
+            (category, metric, value, benchmarks[category][metric])
+            for category in self._BENCHMARK_CATEGORIES
+            if metrics.get(category) and benchmarks.get(category)
+            for metric, value in metrics[category].items()
+            if metric in benchmarks[category]
+        ]
+        comparison = pd.DataFrame(
+            rows, columns=["category", "metric", "business_value", "benchmark_value"]
+        ).astype({"business_value": object, "benchmark_value": object})
+
+        # Numeric pairs are compared in one vectorised pass; anything else is N/A
+        business_numeric = pd.to_numeric(comparison["business_value"], errors="coerce")
+        benchmark_numeric = pd.to_numeric(comparison["benchmark_value"], errors="coerce")
+        differences = (business_numeric - benchmark_numeric).to_numpy(dtype=np.float64)
+        comparable = ~np.isnan(differences)
+        comparison["difference"] = np.where(comparable, differences, None)
+        comparison.loc[~comparable, "difference"] = "N/A"
+        comparison["performance"] = np.select(
+            [~comparable, differences > 0, differences < 0],
+            ["N/A", "Above Average", "Below Average"],
+            default="Average"
+        )
+        return comparison
 
-    def _generate_benchmark_recommendations(self, comparisons: Dict) -> List[str]:
+    def _generate_benchmark_recommendations(self, comparison: pd.DataFrame) -> List[str]:
         """Generate recommendations based on benchmark comparisons."""
-        recommendations = []
-        
-        # Financial recommendations
-        if "financial" in comparisons:
-            for metric, data in comparisons["financial"].items():
-                if data["performance"] == "Below Average":
-                    if metric == "revenue":
-                        recommendations.append(f"Consider strategies to increase revenue streams, such as expanding product lines or entering new markets")
-                    elif metric == "profit_margin":
-                        recommendations.append(f"Focus on improving profit margins through cost optimization and pricing strategies")
-                    elif metric == "operating_costs":
-                        recommendations.append(f"Review and optimize operational costs to align with industry standards")
-        
-        # Operational recommendations
-        if "operational" in comparisons:
-            for metric, data in comparisons["operational"].items():
-                if data["performance"] == "Below Average":
-                    if metric == "customer_satisfaction":
-                        recommendations.append(f"Implement customer feedback programs to improve satisfaction scores")
-                    elif metric == "employee_satisfaction":
-                        recommendations.append(f"Review employee engagement initiatives and workplace culture")
-                    elif metric == "project_completion_rate":
-                        recommendations.append(f"Analyze project management processes for efficiency improvements")
-        
-        # Growth recommendations
-        if "growth" in comparisons:
-            for metric, data in comparisons["growth"].items():
-                if data["performance"] == "Below Average":
-                    if metric == "revenue_growth":
-                        recommendations.append(f"Develop strategies to accelerate revenue growth through market expansion")
-                    elif metric == "customer_growth":
-                        recommendations.append(f"Focus on customer acquisition and retention strategies")
-                    elif metric == "market_share_growth":
-                        recommendations.append(f"Consider competitive positioning and market penetration strategies")
-        
+        below = comparison[comparison["performance"] == "Below Average"]
+        recommendations = below.merge(self._RECS_DF, on=["category", "metric"])["recommendation"].tolist()
         return recommendations if recommendations else ["Maintain current performance levels and monitor industry trends"]
 
     async def _generate_competitive_insights(self, business, competitors) -> Dict:
         """Generate AI-powered competitive insights."""
-        prompt = f"""Analyze the competitive position for a {business.industry} business in {business.state}, considering:
-        1. Market opportunities
-        2. Competitive threats
-        3. Strategic recommendations"""
+        prompt = self._COMPETITIVE_PROMPT.format(industry=business.industry, state=business.state)
 
-        response = await self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a business strategy expert."},
+        content = await self._cached_completion(
+            [
+                self._SYS_STRATEGY,
                 {"role": "user", "content": prompt}
-            ]
+            ],
+            model="gpt-3.5-turbo"
         )
 
-        return self._parse_insights(response.choices[0].message.content)
+        return self._parse_insights(content)
 
     def _parse_insights(self, content: str) -> Dict:
         """Parse competitive insights from OpenAI response."""
@@ -452,27 +858,20 @@ class EnhancedBusinessIntelligenceService:
 
     async def generate_funding_opportunities(self, business_id: int) -> Dict:
         """Generate funding opportunities analysis based on business type."""
-        business = self.session.query(Business).get(business_id)
-        if not business:
-            raise ValueError("Business not found")
-
-        prompt = f"""Analyze funding opportunities for a {business.industry} {'non-profit' if business.is_nonprofit else 'for-profit'} organization in {business.state}.
-        Consider:
-        1. {"Grants and charitable foundations" if business.is_nonprofit else "Venture capital and angel investors"}
-        2. {"Individual donor strategies" if business.is_nonprofit else "Bank loans and credit lines"}
-        3. {"Corporate sponsorships" if business.is_nonprofit else "Revenue-based financing"}
-        4. Crowdfunding opportunities
-        5. Tax implications and benefits"""
-
-        response = await self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a financial advisor specializing in organizational funding."},
+        business = self._get_business(business_id)
+
+        template = self._FUNDING_PROMPT_NP if business.is_nonprofit else self._FUNDING_PROMPT_FP
+        prompt = template.format(industry=business.industry, state=business.state)
+
+        content = await self._cached_completion(
+            [
+                self._SYS_FUNDING,
                 {"role": "user", "content": prompt}
-            ]
+            ],
+            model="gpt-3.5-turbo"
         )
 
-        return self._parse_funding_opportunities(response.choices[0].message.content)
+        return self._parse_funding_opportunities(content)
 
     def _parse_funding_opportunities(self, content: str) -> Dict:
         """Parse funding opportunities from OpenAI response."""
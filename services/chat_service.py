@@ -1,12 +1,139 @@
-import openai
-from typing import List, Dict, Optional
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from datetime import datetime
 from models import Business, User
-import json
+from services.openai_client import acreate_chat_completion, acreate_embedding, get_async_client
+from services.semantic_cache import EMBEDDING_MODEL, response_cache
+import os
+
+import orjson
+
+# Identical for every user and business; keep anything per-session out of it
+ADAM_SYSTEM_PREFIX = """You are Adam, an AI business formation assistant and virtual CEO. You help entrepreneurs form and manage their LLCs while providing strategic business guidance.
+
+When the context below names an active business, your role is to provide specific guidance for that business, including:
+1. LLC formation and compliance requirements
+2. Industry-specific insights and recommendations
+3. Strategic business planning and growth opportunities
+
+When there is no active business, your role is to:
+1. Guide users through the LLC formation process
+2. Provide general business advice and best practices
+3. Help users make informed decisions about their business structure
+
+Please maintain a professional yet friendly tone, and always provide actionable insights and clear next steps."""
+
+# Routes every chat request to the same prompt cache shard
+PROMPT_CACHE_KEY = "adam-chat-v1"
+
+@dataclass(slots=True)
+class Recommendation:
+    """One recommendation from a business query analysis; orjson and Flask serialise it as an object."""
+    description: str
+    priority: str = "medium"
+
+@lru_cache(maxsize=1024)
+def _build_system_prompt(first_name: str, last_name: str,
+                         business_name: Optional[str] = None,
+                         formation_status: Optional[str] = None,
+                         state: Optional[str] = None,
+                         industry: Optional[str] = None) -> str:
+    """Format Adam's system prompt.
+
+    Keyed on the displayed values themselves, so an edited business simply
+    misses the cache instead of serving a stale prompt.
+    """
+    context = f"Current User: {first_name} {last_name}\n"
+    if business_name is not None:
+        context += f"""Active Business: {business_name}
+Formation Status: {formation_status}
+State: {state}
+Industry: {industry}
+"""
+    else:
+        context += "Active Business: none\n"
+
+    return ADAM_SYSTEM_PREFIX + "\n\nContext:\n" + context
+
+def _object(properties: Dict) -> Dict:
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+def _strict_schema(name: str, properties: Dict) -> Dict:
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "strict": True, "schema": _object(properties)}
+    }
+
+def _object_list(properties: Dict) -> Dict:
+    return {"type": "array", "items": _object(properties)}
+
+# Structured outputs hand back actions and recommendations ready to use
+ADAM_RESPONSE_FORMAT = _strict_schema("adam_response", {
+    "message": {"type": "string"},
+    "actions": _object_list({
+        "type": {"type": "string", "enum": ["task_list", "document_review", "state_filing"]},
+        "description": {"type": "string"}
+    })
+})
+_ANALYSIS_PROPERTIES = {
+    "analysis": {"type": "string"},
+    "recommendations": _object_list({
+        "description": {"type": "string"},
+        "priority": {"type": "string", "enum": ["high", "medium"]}
+    })
+}
+ANALYSIS_RESPONSE_FORMAT = _strict_schema("business_query_analysis", _ANALYSIS_PROPERTIES)
+
+# Category -> (how the query is described, what the analysis should consider)
+QUERY_CATEGORIES = {
+    "market": ("market-related", [
+        "Market trends and opportunities",
+        "Competitive landscape",
+        "Customer demographics",
+        "Growth potential"
+    ]),
+    "financial": ("financial", [
+        "Revenue optimization",
+        "Cost management",
+        "Cash flow implications",
+        "Financial risks and opportunities"
+    ]),
+    "operations": ("operational", [
+        "Operational efficiency",
+        "Resource allocation",
+        "Process optimization",
+        "Risk management"
+    ]),
+}
+
+def _structured_payload(response) -> Dict:
+    """Parse a structured-output reply, rejecting one cut off by the token limit.
+
+    A cut-off reply is a JSON fragment; it raises here rather than reaching
+    the user or the response cache.
+    """
+    choice = response.choices[0]
+    if choice.finish_reason == "length":
+        raise ValueError("The reply was cut off before it was complete")
+    return orjson.loads(choice.message.content)
+
+def _numbered(items: List[str]) -> str:
+    return "\n".join(f"{i}. {item}" for i, item in enumerate(items, 1))
 
 class ChatService:
+    # Structured outputs need a model that supports json_schema response formats
+    CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o-mini")
+
     def __init__(self, db_session):
         self.db_session = db_session
+        self.client = get_async_client()
+        self.cache = response_cache
         self.context_window = 10  # Number of previous messages to include for context
 
     async def get_response(self, 
@@ -15,35 +142,37 @@ class ChatService:
                           business_id: Optional[int] = None,
                           context: Optional[List[Dict]] = None) -> Dict:
         """Get a response from Adam based on user input and context."""
-        
-        # Get user and business information
-        user = self.db_session.query(User).get(user_id)
-        business = None
-        if business_id:
-            business = self.db_session.query(Business).get(business_id)
 
-        # Build the conversation context
-        conversation = self._build_conversation_context(user, business, context)
-        conversation.append({
-            "role": "user",
-            "content": message
-        })
+        # Only opening turns are cached; with history the same words can mean something else
+        namespace = f"user:{user_id}:biz:{business_id}"
+        embedding = None
+        if not context:
+            cached, embedding = await self._cache_lookup(namespace, message)
+            if cached is not None:
+                return {**cached, "timestamp": datetime.utcnow().isoformat()}
+
+        conversation = self._conversation_for(user_id, message, business_id, context)
 
         try:
             # Get response from OpenAI
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
+            response = await acreate_chat_completion(
+                self.client,
+                model=self.CHAT_MODEL,
                 messages=conversation,
                 temperature=0.7,
-                max_tokens=500
+                max_tokens=500,
+                response_format=ADAM_RESPONSE_FORMAT,
+                extra_body={"prompt_cache_key": PROMPT_CACHE_KEY}
             )
 
-            # Extract and process the response
-            ai_message = response.choices[0].message.content
-            
-            # Check for any actions or recommendations
-            actions = self._extract_actions(ai_message)
-            
+            # A truncated or off-schema reply raises, so it gets the apology below
+            # and is never cached
+            payload = _structured_payload(response)
+            ai_message, actions = payload["message"], payload["actions"]
+
+            if not context:
+                self.cache.store(namespace, message, embedding, {"message": ai_message, "actions": actions})
+
             return {
                 "message": ai_message,
                 "actions": actions,
@@ -57,6 +186,99 @@ class ChatService:
                 "timestamp": datetime.utcnow().isoformat()
             }
 
+    async def stream_response(self,
+                              user_id: int,
+                              message: str,
+                              business_id: Optional[int] = None,
+                              context: Optional[List[Dict]] = None) -> AsyncIterator[Dict]:
+        """Yield Adam's reply as it is generated.
+
+        Events are {"content": ...} for each piece of text, then a final
+        {"actions": [...], "done": True}. The reply streams as plain text, since
+        a half-finished JSON document can't be shown to the user.
+        """
+        namespace = f"user:{user_id}:biz:{business_id}"
+        embedding = None
+        if not context:
+            cached, embedding = await self._cache_lookup(namespace, message)
+            if cached is not None:
+                yield {"content": cached["message"]}
+                yield {"actions": cached["actions"], "done": True}
+                return
+
+        conversation = self._conversation_for(user_id, message, business_id, context)
+
+        parts = []
+        finish_reason = None
+        try:
+            stream = await acreate_chat_completion(
+                self.client,
+                model=self.CHAT_MODEL,
+                messages=conversation,
+                temperature=0.7,
+                max_tokens=500,
+                stream=True,
+                extra_body={"prompt_cache_key": PROMPT_CACHE_KEY}
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield {"content": delta}
+        except Exception as e:
+            yield {"error": str(e), "done": True}
+            return
+
+        ai_message = "".join(parts)
+        actions = self._extract_actions(ai_message)
+        # A reply cut off by the token limit has been shown, but is not reused
+        if not context and finish_reason != "length":
+            self.cache.store(namespace, message, embedding, {"message": ai_message, "actions": actions})
+        yield {"actions": actions, "done": True}
+
+    def _conversation_for(self,
+                          user_id: int,
+                          message: str,
+                          business_id: Optional[int],
+                          context: Optional[List[Dict]]) -> List[Dict]:
+        """Load the user and business and build the messages for one turn."""
+        user = self.db_session.get(User, user_id)
+        business = None
+        if business_id:
+            business = self.db_session.get(Business, business_id)
+
+        conversation = self._build_conversation_context(user, business, context)
+        conversation.append({
+            "role": "user",
+            "content": message
+        })
+        return conversation
+
+    async def _cache_lookup(self, namespace: str, text: str) -> Tuple[Optional[Dict], Optional[List[float]]]:
+        """Look text up in the response cache, by exact match and then by meaning.
+
+        Returns the cached payload (or None) and the text's embedding, so a miss
+        can be stored without embedding twice. Embedding failures only cost the
+        semantic tier.
+        """
+        cached = self.cache.get_exact(namespace, text)
+        if cached is not None:
+            return cached, None
+        embedding = await self._embed(text)
+        if embedding is None:
+            return None, None
+        return self.cache.lookup(namespace, embedding), embedding
+
+    async def _embed(self, text: str) -> Optional[List[float]]:
+        try:
+            response = await acreate_embedding(self.client, model=EMBEDDING_MODEL, input=text)
+        except Exception:
+            return None
+        return response.data[0].embedding
+
     def _build_conversation_context(self, 
                                   user: User, 
                                   business: Optional[Business] = None,
@@ -81,38 +303,17 @@ class ChatService:
         return conversation
 
     def _get_system_prompt(self, user: User, business: Optional[Business] = None) -> str:
-        """Generate the system prompt for Adam."""
-        
-        prompt = f"""You are Adam, an AI business formation assistant and virtual CEO. You help entrepreneurs form and manage their LLCs while providing strategic business guidance.
-
-Current User: {user.first_name} {user.last_name}
-"""
+        """Generate the system prompt for Adam.
 
+        The shared ADAM_SYSTEM_PREFIX comes first and the user/business details
+        last, so OpenAI can serve the prefix from its prompt cache.
+        """
         if business:
-            prompt += f"""
-Active Business: {business.name}
-Formation Status: {business.formation_status}
-State: {business.state}
-Industry: {business.industry}
-
-Your role is to provide specific guidance for this business, including:
-1. LLC formation and compliance requirements
-2. Industry-specific insights and recommendations
-3. Strategic business planning and growth opportunities
-"""
-        else:
-            prompt += """
-Your role is to:
-1. Guide users through the LLC formation process
-2. Provide general business advice and best practices
-3. Help users make informed decisions about their business structure
-"""
-
-        prompt += """
-Please maintain a professional yet friendly tone, and always provide actionable insights and clear next steps.
-"""
-
-        return prompt
+            return _build_system_prompt(
+                user.first_name, user.last_name,
+                business.name, business.formation_status, business.state, business.industry
+            )
+        return _build_system_prompt(user.first_name, user.last_name)
 
     def _extract_actions(self, message: str) -> List[Dict]:
         """Extract any recommended actions from the AI's response."""
@@ -145,40 +346,23 @@ Please maintain a professional yet friendly tone, and always provide actionable
                                    category: Optional[str] = None) -> Dict:
         """Analyze a specific business query and provide detailed insights."""
         
-        business = self.db_session.query(Business).get(business_id)
+        business = self.db_session.get(Business, business_id)
         if not business:
             raise ValueError("Business not found")
 
-        # Prepare the analysis prompt based on category
-        if category == "market":
-            prompt = f"""Analyze the following market-related query for {business.name} in the {business.industry} industry:
-{query}
-
-Consider:
-1. Market trends and opportunities
-2. Competitive landscape
-3. Customer demographics
-4. Growth potential
-"""
-        elif category == "financial":
-            prompt = f"""Analyze the following financial query for {business.name}:
-{query}
+        namespace = f"biz:{business_id}:category:{category}"
+        cached, embedding = await self._cache_lookup(namespace, query)
+        if cached is not None:
+            return {**cached, "timestamp": datetime.utcnow().isoformat()}
 
-Consider:
-1. Revenue optimization
-2. Cost management
-3. Cash flow implications
-4. Financial risks and opportunities
-"""
-        elif category == "operations":
-            prompt = f"""Analyze the following operational query for {business.name}:
+        # Prepare the analysis prompt based on category
+        if category in QUERY_CATEGORIES:
+            kind, considerations = QUERY_CATEGORIES[category]
+            prompt = f"""Analyze the following {kind} query for {business.name} in the {business.industry} industry:
 {query}
 
 Consider:
-1. Operational efficiency
-2. Resource allocation
-3. Process optimization
-4. Risk management
+{_numbered(considerations)}
 """
         else:
             prompt = f"""Analyze the following business query for {business.name}:
@@ -188,24 +372,27 @@ Provide comprehensive insights and actionable recommendations.
 """
 
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
+            response = await acreate_chat_completion(
+                self.client,
+                model=self.CHAT_MODEL,
                 messages=[
-                    {"role": "system", "content": "You are a business analysis expert."},
+                    {"role": "system", "content": "You are a business analysis expert. Respond in JSON matching the schema."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.7
+                temperature=0.7,
+                response_format=ANALYSIS_RESPONSE_FORMAT
             )
 
-            analysis = response.choices[0].message.content
-
-            return {
+            payload = _structured_payload(response)
+            result = {
                 "query": query,
                 "category": category,
-                "analysis": analysis,
-                "recommendations": self._extract_recommendations(analysis),
-                "timestamp": datetime.utcnow().isoformat()
+                "analysis": payload["analysis"],
+                "recommendations": [Recommendation(**item) for item in payload["recommendations"]]
             }
+            self.cache.store(namespace, query, embedding, result)
+
+            return {**result, "timestamp": datetime.utcnow().isoformat()}
 
         except Exception as e:
             return {
@@ -213,31 +400,83 @@ Provide comprehensive insights and actionable recommendations.
                 "timestamp": datetime.utcnow().isoformat()
             }
 
-    def _extract_recommendations(self, analysis: str) -> List[Dict]:
-        """Extract structured recommendations from the analysis text."""
-        recommendations = []
-        
-        # Split analysis into lines and look for numbered items or bullet points
-        lines = analysis.split('\n')
-        current_rec = None
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Look for numbered recommendations or bullet points
-            if line.startswith(('1.', '2.', '3.', '•', '-')):
-                if current_rec:
-                    recommendations.append(current_rec)
-                current_rec = {
-                    "description": line.lstrip('123456789.- '),
-                    "priority": "high" if "immediate" in line.lower() or "critical" in line.lower() else "medium"
-                }
-            elif current_rec and line:
-                # Add details to current recommendation
-                current_rec["description"] += " " + line
-
-        # Add the last recommendation if exists
-        if current_rec:
-            recommendations.append(current_rec)
-
-        return recommendations
+    async def analyze_business_multi(self,
+                                     query: str,
+                                     business_id: int,
+                                     categories: List[str]) -> Dict[str, Dict]:
+        """Analyze one query from several categories with a single completion.
+
+        Returns a result per category, shaped like analyze_business_query's.
+        Each result is cached as if its category had been asked on its own,
+        and categories already in the cache are left out of the request.
+        """
+        business = self.db_session.get(Business, business_id)
+        if not business:
+            raise ValueError("Business not found")
+        categories = list(dict.fromkeys(categories))
+        unknown = [category for category in categories if category not in QUERY_CATEGORIES]
+        if unknown:
+            raise ValueError(f"Unknown categories: {', '.join(unknown)}")
+
+        results = {}
+        namespaces = {category: f"biz:{business_id}:category:{category}" for category in categories}
+        for category in categories:
+            cached = self.cache.get_exact(namespaces[category], query)
+            if cached is not None:
+                results[category] = cached
+        embedding = None
+        if len(results) < len(categories):
+            embedding = await self._embed(query)
+            if embedding is not None:
+                for category in categories:
+                    if category not in results:
+                        cached = self.cache.lookup(namespaces[category], embedding)
+                        if cached is not None:
+                            results[category] = cached
+
+        pending = [category for category in categories if category not in results]
+        timestamp = datetime.utcnow().isoformat()
+        if pending:
+            sections = "\n\n".join(
+                f"{category} ({QUERY_CATEGORIES[category][0]} perspective), considering:\n"
+                f"{_numbered(QUERY_CATEGORIES[category][1])}"
+                for category in pending
+            )
+            prompt = f"""Analyze the following query for {business.name} in the {business.industry} industry:
+{query}
+
+Give a separate analysis with recommendations for each of these perspectives, under the key of the same name:
+{sections}
+"""
+            response_format = _strict_schema(
+                "business_query_analyses",
+                {category: _object(_ANALYSIS_PROPERTIES) for category in pending}
+            )
+            try:
+                response = await acreate_chat_completion(
+                    self.client,
+                    model=self.CHAT_MODEL,
+                    messages=[
+                        {"role": "system", "content": "You are a business analysis expert. Respond in JSON matching the schema."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.7,
+                    response_format=response_format
+                )
+                payload = _structured_payload(response)
+                for category in pending:
+                    result = {
+                        "query": query,
+                        "category": category,
+                        "analysis": payload[category]["analysis"],
+                        "recommendations": [
+                            Recommendation(**item) for item in payload[category]["recommendations"]
+                        ]
+                    }
+                    self.cache.store(namespaces[category], query, embedding, result)
+                    results[category] = result
+            except Exception as e:
+                for category in pending:
+                    results[category] = {"error": f"Analysis failed: {str(e)}"}
+
+        return {category: {**results[category], "timestamp": timestamp} for category in categories}
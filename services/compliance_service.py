@@ -1,92 +1,90 @@
 from datetime import datetime, timedelta
 from models import ComplianceItem, Business, Notification
-from sqlalchemy import and_
+from sqlalchemy import and_, case, func, insert
 
 class ComplianceService:
+    # Filing requirements per state, keyed by compliance item type
+    STATE_REQUIREMENTS = {
+        'DE': {
+            'annual_report': {
+                'due_date': 'March 1',
+                'fee': 300,
+                'requirements': ['business_info', 'registered_agent']
+            },
+            'franchise_tax': {
+                'due_date': 'March 1',
+                'requirements': ['tax_calculation']
+            }
+        },
+        'WY': {
+            'annual_report': {
+                'due_date': 'First day of anniversary month',
+                'fee': 50,
+                'requirements': ['business_info', 'principal_address']
+            }
+        },
+        # Add more states as needed
+    }
+
     def __init__(self, db_session):
         self.db_session = db_session
-        self.state_requirements = {
-            'DE': {
-                'annual_report': {
-                    'due_date': 'March 1',
-                    'fee': 300,
-                    'requirements': ['business_info', 'registered_agent']
-                },
-                'franchise_tax': {
-                    'due_date': 'March 1',
-                    'requirements': ['tax_calculation']
-                }
-            },
-            'WY': {
-                'annual_report': {
-                    'due_date': 'First day of anniversary month',
-                    'fee': 50,
-                    'requirements': ['business_info', 'principal_address']
-                }
-            },
-            # Add more states as needed
-        }
+        self.state_requirements = self.STATE_REQUIREMENTS
 
     def initialize_compliance_calendar(self, business_id):
         """Set up initial compliance calendar for a new business."""
-        business = self.db_session.query(Business).get(business_id)
+        business = self.db_session.get(Business, business_id)
         if not business:
             raise ValueError("Business not found")
 
-        state_reqs = self.state_requirements.get(business.state, {})
         formation_date = business.created_at
+        rows = [
+            self._BUILDERS[req_type](self, business, formation_date, state_reqs)
+            for req_type, state_reqs in self.state_requirements.get(business.state, {}).items()
+        ]
+        rows.extend(self._initial_compliance_rows(business))
 
-        # Add annual report requirement
-        if 'annual_report' in state_reqs:
-            self._add_annual_report_requirement(business, formation_date)
-
-        # Add franchise tax requirement if applicable
-        if 'franchise_tax' in state_reqs:
-            self._add_franchise_tax_requirement(business, formation_date)
-
-        # Add initial compliance items
-        self._add_initial_compliance_items(business)
-
+        # Plain rows go out as one executemany without per-object unit-of-work tracking
+        self.db_session.execute(insert(ComplianceItem), rows)
         self.db_session.commit()
 
-    def _add_annual_report_requirement(self, business, formation_date):
-        """Add annual report compliance item."""
-        state_reqs = self.state_requirements[business.state]['annual_report']
-        
+    def _annual_report_row(self, business, formation_date, state_reqs):
+        """Build the annual report compliance row."""
         if business.state == 'DE':
             due_date = datetime(formation_date.year + 1, 3, 1)
         else:
             # Default to anniversary month
             due_date = formation_date.replace(year=formation_date.year + 1)
 
-        compliance_item = ComplianceItem(
-            business_id=business.id,
-            type='annual_report',
-            due_date=due_date,
-            description=f"File annual report for {business.name}",
-            requirements=state_reqs,
-            status='pending'
-        )
-        self.db_session.add(compliance_item)
-
-    def _add_franchise_tax_requirement(self, business, formation_date):
-        """Add franchise tax compliance item."""
-        state_reqs = self.state_requirements[business.state]['franchise_tax']
-        
+        return {
+            'business_id': business.id,
+            'type': 'annual_report',
+            'due_date': due_date,
+            'description': f"File annual report for {business.name}",
+            'requirements': state_reqs,
+            'status': 'pending'
+        }
+
+    def _franchise_tax_row(self, business, formation_date, state_reqs):
+        """Build the franchise tax compliance row."""
         due_date = datetime(formation_date.year + 1, 3, 1)
-        
-        compliance_item = ComplianceItem(
-            business_id=business.id,
-            type='franchise_tax',
-            due_date=due_date,
-            description=f"File franchise tax for {business.name}",
-            requirements=state_reqs,
-            status='pending'
-        )
-        self.db_session.add(compliance_item)
-
-    def _add_initial_compliance_items(self, business):
-        """Add initial compliance items for a new business."""
+
+        return {
+            'business_id': business.id,
+            'type': 'franchise_tax',
+            'due_date': due_date,
+            'description': f"File franchise tax for {business.name}",
+            'requirements': state_reqs,
+            'status': 'pending'
+        }
+
+    # Builder for each requirement type that can appear in STATE_REQUIREMENTS
+    _BUILDERS = {
+        'annual_report': _annual_report_row,
+        'franchise_tax': _franchise_tax_row,
+    }
+
+    def _initial_compliance_rows(self, business):
+        """Build the initial compliance rows for a new business."""
         initial_items = [
             {
                 'type': 'ein_application',
@@ -117,88 +115,102 @@ class ComplianceService:
             }
         ]
 
-        for item in initial_items:
-            compliance_item = ComplianceItem(
-                business_id=business.id,
-                type=item['type'],
-                due_date=item['due_date'],
-                description=item['description'],
-                requirements=item['requirements'],
-                status='pending'
-            )
-            self.db_session.add(compliance_item)
+        return [
+            {**item, 'business_id': business.id, 'status': 'pending'}
+            for item in initial_items
+        ]
 
     def check_upcoming_deadlines(self):
         """Check for upcoming compliance deadlines and create notifications."""
-        # Get items due in the next 30 days
-        thirty_days_from_now = datetime.utcnow() + timedelta(days=30)
-        upcoming_items = self.db_session.query(ComplianceItem).filter(
+        # Get items due in the next 30 days along with their owners in one query
+        now = datetime.utcnow()
+        thirty_days_from_now = now + timedelta(days=30)
+        upcoming_items = self.db_session.query(
+            ComplianceItem.description,
+            ComplianceItem.due_date,
+            Business.owner_id
+        ).join(Business, Business.id == ComplianceItem.business_id).filter(
             and_(
                 ComplianceItem.status == 'pending',
                 ComplianceItem.due_date <= thirty_days_from_now
             )
         ).all()
 
-        for item in upcoming_items:
-            business = self.db_session.query(Business).get(item.business_id)
-            days_until_due = (item.due_date - datetime.utcnow()).days
+        notifications = []
+        for description, due_date, owner_id in upcoming_items:
+            days_until_due = (due_date - now).days
 
             # Create notification based on urgency
             if days_until_due <= 7:
                 priority = 'high'
-                message = f"URGENT: {item.description} due in {days_until_due} days"
+                message = f"URGENT: {description} due in {days_until_due} days"
             elif days_until_due <= 14:
                 priority = 'medium'
-                message = f"Important: {item.description} due in {days_until_due} days"
+                message = f"Important: {description} due in {days_until_due} days"
             else:
                 priority = 'normal'
-                message = f"Reminder: {item.description} due in {days_until_due} days"
+                message = f"Reminder: {description} due in {days_until_due} days"
 
-            notification = Notification(
-                user_id=business.owner_id,
+            notifications.append(Notification(
+                user_id=owner_id,
                 type='compliance_deadline',
                 content=message,
                 priority=priority
-            )
-            self.db_session.add(notification)
+            ))
 
+        self.db_session.add_all(notifications)
         self.db_session.commit()
 
     def update_compliance_status(self, compliance_item_id, new_status, notes=None):
         """Update the status of a compliance item."""
-        item = self.db_session.query(ComplianceItem).get(compliance_item_id)
+        item = self.db_session.get(ComplianceItem, compliance_item_id)
         if not item:
             raise ValueError("Compliance item not found")
 
         item.status = new_status
         if notes:
-            item.description += f"\nNotes: {notes}"
+            # Reassigned rather than appended so the JSON column is marked dirty
+            item.notes = [*(item.notes or []), notes]
 
         self.db_session.commit()
 
     def get_compliance_summary(self, business_id):
         """Get a summary of compliance status for a business."""
-        items = self.db_session.query(ComplianceItem).filter_by(
-            business_id=business_id
-        ).all()
+        now = datetime.utcnow()
+        counts = self.db_session.query(
+            ComplianceItem.status,
+            func.count(ComplianceItem.id),
+            func.sum(case((ComplianceItem.due_date < now, 1), else_=0))
+        ).filter_by(business_id=business_id).group_by(ComplianceItem.status).all()
+        by_status = {status: (count, past_due or 0) for status, count, past_due in counts}
 
         summary = {
-            'total_items': len(items),
-            'completed': sum(1 for item in items if item.status == 'completed'),
-            'pending': sum(1 for item in items if item.status == 'pending'),
-            'overdue': sum(1 for item in items if item.status == 'pending' and item.due_date < datetime.utcnow()),
+            'total_items': sum(count for count, _ in by_status.values()),
+            'completed': by_status.get('completed', (0, 0))[0],
+            'pending': by_status.get('pending', (0, 0))[0],
+            'overdue': by_status.get('pending', (0, 0))[1],
             'upcoming': []
         }
 
-        # Add upcoming items
-        thirty_days_from_now = datetime.utcnow() + timedelta(days=30)
-        for item in items:
-            if item.status == 'pending' and item.due_date <= thirty_days_from_now:
-                summary['upcoming'].append({
-                    'id': item.id,
-                    'description': item.description,
-                    'due_date': item.due_date.isoformat(),
-                    'days_until_due': (item.due_date - datetime.utcnow()).days
-                })
+        # Add upcoming items, loading only the columns the summary shows
+        thirty_days_from_now = now + timedelta(days=30)
+        upcoming_items = self.db_session.query(
+            ComplianceItem.id,
+            ComplianceItem.description,
+            ComplianceItem.due_date
+        ).filter(
+            and_(
+                ComplianceItem.business_id == business_id,
+                ComplianceItem.status == 'pending',
+                ComplianceItem.due_date <= thirty_days_from_now
+            )
+        ).all()
+        for item_id, description, due_date in upcoming_items:
+            summary['upcoming'].append({
+                'id': item_id,
+                'description': description,
+                'due_date': due_date.isoformat(),
+                'days_until_due': (due_date - now).days
+            })
 
         return summary
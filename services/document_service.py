@@ -1,35 +1,85 @@
+import logging
 import os
-from jinja2 import Template
+from concurrent.futures import ThreadPoolExecutor
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 import json
 from datetime import datetime
 from models import Document, Business
 
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '../templates')
+
+# Shared by every DocumentService so each template is read and compiled once
+# per process; the bytecode cache lets a fresh process skip parsing as well
+_TEMPLATE_ENV = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    auto_reload=False,
+    cache_size=-1,
+    bytecode_cache=FileSystemBytecodeCache(os.getenv('JINJA_CACHE_DIR'))
+)
+
+
+def warm_templates():
+    """Compile every template up front so the first render after startup doesn't parse."""
+    for name in _TEMPLATE_ENV.list_templates(extensions=['j2']):
+        _TEMPLATE_ENV.get_template(name)
+
+# Renders documents queued by queue_documents, several at a time
+_RENDER_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='document-render')
+
 class DocumentService:
     def __init__(self, db_session):
         self.db_session = db_session
-        self.template_dir = os.path.join(os.path.dirname(__file__), '../templates')
+        self.template_dir = TEMPLATE_DIR
+        self.env = _TEMPLATE_ENV
 
     def generate_operating_agreement(self, business_id):
         """Generate an Operating Agreement based on business information."""
-        business = self.db_session.query(Business).get(business_id)
-        if not business:
-            raise ValueError("Business not found")
+        return self._generate('operating_agreement', business_id)
 
-        template_path = os.path.join(self.template_dir, 'operating_agreement.j2')
-        with open(template_path, 'r') as f:
-            template = Template(f.read())
+    def generate_articles_of_organization(self, business_id):
+        """Generate Articles of Organization based on business information."""
+        return self._generate('articles_of_organization', business_id)
 
-        content = template.render(
-            business_name=business.name,
-            state=business.state,
-            formation_date=business.created_at.strftime('%B %d, %Y'),
-            owner_name=f"{business.owner.first_name} {business.owner.last_name}",
-        )
+    def generate_ein_application(self, business_id):
+        """Generate EIN application (Form SS-4) based on business information."""
+        return self._generate('ein_application', business_id)
+
+    def queue_documents(self, business_id, document_types, session_factory):
+        """Create documents as 'queued' and render them on background threads.
+
+        Returns the new documents straight away; each one moves to 'draft'
+        once its worker has rendered and committed it, or to 'failed'.
+        session_factory opens the workers' own sessions, since a session
+        can't be shared across threads.
+        """
+        business = self._get_business(business_id)
+        documents = [
+            Document(
+                name=f"{business.name} - {self._DOCUMENT_TYPES[document_type][0]}",
+                type=document_type,
+                business_id=business_id,
+                owner_id=business.owner_id,
+                status="queued"
+            )
+            for document_type in document_types
+        ]
+        self.db_session.add_all(documents)
+        self.db_session.commit()
+
+        for document in documents:
+            _RENDER_EXECUTOR.submit(_render_queued_document, session_factory, document.id)
+        return documents
+
+    def _generate(self, document_type, business_id):
+        business = self._get_business(business_id)
+        title, render = self._DOCUMENT_TYPES[document_type]
 
         document = Document(
-            name=f"{business.name} - Operating Agreement",
-            type="operating_agreement",
-            content=content,
+            name=f"{business.name} - {title}",
+            type=document_type,
+            content=render(self, business),
             business_id=business_id,
             owner_id=business.owner_id,
             status="draft"
@@ -39,17 +89,24 @@ class DocumentService:
         self.db_session.commit()
         return document
 
-    def generate_articles_of_organization(self, business_id):
-        """Generate Articles of Organization based on business information."""
-        business = self.db_session.query(Business).get(business_id)
+    def _get_business(self, business_id):
+        business = self.db_session.get(Business, business_id)
         if not business:
             raise ValueError("Business not found")
+        return business
 
-        template_path = os.path.join(self.template_dir, f'articles_{business.state.lower()}.j2')
-        with open(template_path, 'r') as f:
-            template = Template(f.read())
+    def _render_operating_agreement(self, business):
+        template = self.env.get_template('operating_agreement.j2')
+        return template.render(
+            business_name=business.name,
+            state=business.state,
+            formation_date=business.created_at.strftime('%B %d, %Y'),
+            owner_name=f"{business.owner.first_name} {business.owner.last_name}",
+        )
 
-        content = template.render(
+    def _render_articles_of_organization(self, business):
+        template = self.env.get_template(f'articles_{business.state.lower()}.j2')
+        return template.render(
             business_name=business.name,
             state=business.state,
             business_address=business.business_address,
@@ -57,30 +114,9 @@ class DocumentService:
             owner_name=f"{business.owner.first_name} {business.owner.last_name}",
         )
 
-        document = Document(
-            name=f"{business.name} - Articles of Organization",
-            type="articles_of_organization",
-            content=content,
-            business_id=business_id,
-            owner_id=business.owner_id,
-            status="draft"
-        )
-
-        self.db_session.add(document)
-        self.db_session.commit()
-        return document
-
-    def generate_ein_application(self, business_id):
-        """Generate EIN application (Form SS-4) based on business information."""
-        business = self.db_session.query(Business).get(business_id)
-        if not business:
-            raise ValueError("Business not found")
-
-        template_path = os.path.join(self.template_dir, 'form_ss4.j2')
-        with open(template_path, 'r') as f:
-            template = Template(f.read())
-
-        content = template.render(
+    def _render_ein_application(self, business):
+        template = self.env.get_template('form_ss4.j2')
+        return template.render(
             business_name=business.name,
             business_address=business.business_address,
             owner_name=f"{business.owner.first_name} {business.owner.last_name}",
@@ -88,22 +124,16 @@ class DocumentService:
             start_date=business.created_at.strftime('%Y-%m-%d'),
         )
 
-        document = Document(
-            name=f"{business.name} - Form SS-4",
-            type="ein_application",
-            content=content,
-            business_id=business_id,
-            owner_id=business.owner_id,
-            status="draft"
-        )
-
-        self.db_session.add(document)
-        self.db_session.commit()
-        return document
+    # Document type -> (title used in the document name, renderer)
+    _DOCUMENT_TYPES = {
+        'operating_agreement': ('Operating Agreement', _render_operating_agreement),
+        'articles_of_organization': ('Articles of Organization', _render_articles_of_organization),
+        'ein_application': ('Form SS-4', _render_ein_application),
+    }
 
     def get_document(self, document_id, user_id):
         """Retrieve a document with permission checking."""
-        document = self.db_session.query(Document).get(document_id)
+        document = self.db_session.get(Document, document_id)
         if not document:
             raise ValueError("Document not found")
         
@@ -132,8 +162,45 @@ class DocumentService:
 
     def list_documents(self, business_id, user_id):
         """List all documents for a business with permission checking."""
-        business = self.db_session.query(Business).get(business_id)
-        if not business or business.owner_id != user_id:
-            raise PermissionError("Not authorized to access these documents")
-            
-        return self.db_session.query(Document).filter_by(business_id=business_id).all()
+        # The ownership check rides along with the fetch; only an empty result
+        # needs a second look to tell "no documents" from "not yours"
+        documents = self.db_session.query(Document).join(
+            Business, Business.id == Document.business_id
+        ).filter(
+            Business.id == business_id,
+            Business.owner_id == user_id
+        ).all()
+        if not documents:
+            owned = self.db_session.query(Business.id).filter_by(
+                id=business_id, owner_id=user_id
+            ).first()
+            if owned is None:
+                raise PermissionError("Not authorized to access these documents")
+
+        return documents
+
+
+def _render_queued_document(session_factory, document_id):
+    """Render a queued document in its own session and mark it 'draft', or 'failed'.
+
+    Runs on an executor thread, where nothing collects exceptions, so
+    failures are logged here.
+    """
+    session = session_factory()
+    try:
+        document = session.get(Document, document_id)
+        if document is None:
+            # Deleted before a worker got to it
+            return
+        service = DocumentService(session)
+        try:
+            business = service._get_business(document.business_id)
+            document.content = service._DOCUMENT_TYPES[document.type][1](service, business)
+            document.status = "draft"
+        except Exception:
+            logger.exception("Rendering queued document %s failed", document_id)
+            session.rollback()
+            document.status = "failed"
+        session.commit()
+    finally:
+        session.close()
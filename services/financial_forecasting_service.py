@@ -1,8 +1,61 @@
-from datetime import datetime, timedelta
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+import threading
+from cachetools import TTLCache
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from models import Business, FinancialRecord
-from sqlalchemy import func
+from sqlalchemy import event, func
+
+# Monthly history per (business, window end date), so a forecast followed by
+# scenarios queries once
+_HISTORY_CACHE = TTLCache(maxsize=1024, ttl=300)
+_HISTORY_CACHE_LOCK = threading.Lock()
+
+@event.listens_for(FinancialRecord, "after_insert")
+@event.listens_for(FinancialRecord, "after_update")
+@event.listens_for(FinancialRecord, "after_delete")
+def _invalidate_history(mapper, connection, target):
+    """Drop the cached history of a business whose records change through the ORM."""
+    with _HISTORY_CACHE_LOCK:
+        for key in [key for key in _HISTORY_CACHE if key[0] == target.business_id]:
+            _HISTORY_CACHE.pop(key, None)
+
+def _linear_trend(y: np.ndarray):
+    """Least-squares slope and intercept of y against 0..n-1.
+
+    Closed form over the handful of monthly points; np.polyfit's general
+    least-squares solve costs far more than the arithmetic at this size.
+    """
+    n = y.size
+    x_mean = (n - 1) / 2
+    y_mean = y.mean()
+    x = np.arange(n) - x_mean
+    slope = (x @ (y - y_mean)) / (x @ x)
+    return slope, y_mean - slope * x_mean
+
+@lru_cache(maxsize=64)
+def _forecast_calendar(start: date, months: int) -> Tuple[Tuple[str, ...], np.ndarray]:
+    """Month labels and 0-based month numbers for a forecast starting after start.
+
+    Forecast months are spaced 30 days apart. The result only changes once a
+    day, so every forecast made that day shares it.
+    """
+    forecast_months = [start + timedelta(days=30 * (i + 1)) for i in range(months)]
+    month_index = np.fromiter((m.month - 1 for m in forecast_months), dtype=np.intp, count=months)
+    month_index.flags.writeable = False
+    return tuple(f"{m.year:04d}-{m.month:02d}" for m in forecast_months), month_index
+
+@dataclass(slots=True)
+class Projection:
+    """Month-by-month forecast columns; row i of every array is dates[i]."""
+    dates: Tuple[str, ...]
+    revenue: np.ndarray
+    growth_rate: np.ndarray
+    fixed: float
+    variable: np.ndarray
+    expenses: np.ndarray
 
 class FinancialForecastingService:
     def __init__(self, db_session):
@@ -10,228 +63,191 @@ class FinancialForecastingService:
 
     def generate_financial_forecast(self, business_id: int, months: int = 12) -> Dict:
         """Generate financial forecasts for the specified number of months."""
-        business = self.db_session.query(Business).get(business_id)
+        return self._build_forecast(self._projection_for(business_id, months))
+
+    def _projection_for(self, business_id: int, months: int) -> Projection:
+        business = self.db_session.get(Business, business_id)
         if not business:
             raise ValueError("Business not found")
 
-        # Get historical data
-        historical_data = self._get_historical_data(business_id)
-        
-        # Generate forecasts
-        revenue_forecast = self._forecast_revenue(historical_data, months)
-        expense_forecast = self._forecast_expenses(historical_data, months)
-        cash_flow_forecast = self._forecast_cash_flow(revenue_forecast, expense_forecast)
-        
+        # One clock reading anchors both the history window and the forecast months
+        now = datetime.utcnow()
+        historical_data = self._get_historical_data(business_id, now)
+        return self._project(historical_data, months, now.date())
+
+    def _build_forecast(self, projection: Projection, revenue_multiplier: float = 1.0,
+                        expense_multiplier: float = 1.0) -> Dict:
+        """Turn a projection, optionally scaled for a scenario, into forecast rows and metrics.
+
+        The columns stay as arrays until here; rows of dicts are built only for
+        the response.
+        """
+        dates = projection.dates
+        fixed_expenses = projection.fixed
+        revenue_arr = projection.revenue * revenue_multiplier
+        expense_arr = projection.expenses * expense_multiplier
+        revenue = revenue_arr.tolist()
+        expenses = expense_arr.tolist()
+
+        revenue_forecast = [
+            {'date': date, 'amount': amount, 'growth_rate': growth_rate}
+            for date, amount, growth_rate in zip(dates, revenue, projection.growth_rate.tolist())
+        ]
+        expense_forecast = [
+            {'date': date, 'amount': amount, 'breakdown': {'fixed': fixed_expenses, 'variable': variable}}
+            for date, amount, variable in zip(dates, expenses, projection.variable.tolist())
+        ]
+        cash_flow_forecast = [
+            {'date': date, 'net_cash_flow': net, 'revenue': amount, 'expenses': spent}
+            for date, net, amount, spent in zip(dates, (revenue_arr - expense_arr).tolist(), revenue, expenses)
+        ]
+
         return {
             'revenue_forecast': revenue_forecast,
             'expense_forecast': expense_forecast,
             'cash_flow_forecast': cash_flow_forecast,
-            'metrics': self._calculate_financial_metrics(revenue_forecast, expense_forecast)
+            'metrics': self._metrics(revenue_arr, expense_arr)
         }
 
-    def _get_historical_data(self, business_id: int) -> Dict:
+    def _get_historical_data(self, business_id: int, end_date: datetime) -> Dict:
         """Retrieve and organize historical financial data."""
+        key = (business_id, end_date.date())
+        with _HISTORY_CACHE_LOCK:
+            cached = _HISTORY_CACHE.get(key)
+        if cached is not None:
+            return cached
+
         # Get the last 12 months of data
-        end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=365)
 
-        records = self.db_session.query(
-            FinancialRecord
+        # Monthly totals per type, summed by the database
+        month = self._month_bucket(FinancialRecord.date)
+        rows = self.db_session.query(
+            month,
+            FinancialRecord.type,
+            func.sum(FinancialRecord.amount)
         ).filter(
             FinancialRecord.business_id == business_id,
-            FinancialRecord.date >= start_date
-        ).all()
-
-        # Organize data by type and month
-        data = {
-            'revenue': self._organize_monthly_data(
-                [r for r in records if r.type == 'revenue']
-            ),
-            'expenses': self._organize_monthly_data(
-                [r for r in records if r.type == 'expense']
-            ),
-            'cash_flow': self._organize_monthly_data(
-                [r for r in records if r.type in ['revenue', 'expense']]
-            )
-        }
-
+            FinancialRecord.date >= start_date,
+            FinancialRecord.type.in_(('revenue', 'expense'))
+        ).group_by(month, FinancialRecord.type).order_by(month).all()
+
+        # Organize data by type and month; expenses count against cash flow
+        data = {'revenue': {}, 'expenses': {}, 'cash_flow': {}}
+        for month_key, record_type, total in rows:
+            if record_type == 'revenue':
+                data['revenue'][month_key] = total
+                data['cash_flow'][month_key] = data['cash_flow'].get(month_key, 0) + total
+            else:
+                data['expenses'][month_key] = -total
+                data['cash_flow'][month_key] = data['cash_flow'].get(month_key, 0) - total
+
+        with _HISTORY_CACHE_LOCK:
+            _HISTORY_CACHE[key] = data
         return data
 
-    def _organize_monthly_data(self, records: List[FinancialRecord]) -> Dict:
-        """Organize financial records by month."""
-        monthly_data = {}
-        for record in records:
-            month_key = record.date.strftime('%Y-%m')
-            if month_key not in monthly_data:
-                monthly_data[month_key] = 0
-            # Add revenue, subtract expenses
-            modifier = 1 if record.type == 'revenue' else -1
-            monthly_data[month_key] += record.amount * modifier
-        return monthly_data
-
-    def _forecast_revenue(self, historical_data: Dict, months: int) -> List[Dict]:
-        """Generate revenue forecasts using time series analysis."""
-        revenue_data = list(historical_data['revenue'].values())
-        
+    def _month_bucket(self, column):
+        """SQL expression formatting column as 'YYYY-MM' in the session's dialect."""
+        if self.db_session.get_bind().dialect.name == 'postgresql':
+            return func.to_char(column, 'YYYY-MM')
+        return func.strftime('%Y-%m', column)
+
+    def _project(self, historical_data: Dict, months: int, start: date) -> Projection:
+        """Project revenue and expenses for the coming months.
+
+        Revenue follows the historical trend scaled by seasonal factors;
+        expenses are the historical fixed floor plus a share of revenue.
+        """
+        revenue_data = np.fromiter(historical_data['revenue'].values(), dtype=float)
+        n = revenue_data.size
+
         # Calculate trend and seasonality
-        if len(revenue_data) >= 12:
-            trend = np.polyfit(range(len(revenue_data)), revenue_data, 1)
-            seasonal_factors = self._calculate_seasonal_factors(revenue_data)
+        if n >= 12:
+            trend = _linear_trend(revenue_data)
+            seasonal_factors = self._calculate_seasonal_factors(
+                revenue_data, list(historical_data['revenue'].keys())
+            )
         else:
             # If less than 12 months of data, use simpler projection
-            trend = [np.mean(revenue_data), 0] if revenue_data else [0, 0]
-            seasonal_factors = [1.0] * 12
-
-        # Generate forecasts
-        forecasts = []
-        last_month = datetime.utcnow()
-        
-        for i in range(months):
-            forecast_month = last_month + timedelta(days=30 * (i + 1))
-            month_index = forecast_month.month - 1
-            
-            # Calculate forecasted value
-            trend_value = trend[0] * (len(revenue_data) + i) + trend[1]
-            seasonal_value = trend_value * seasonal_factors[month_index]
-            
-            forecasts.append({
-                'date': forecast_month.strftime('%Y-%m'),
-                'amount': max(0, seasonal_value),  # Ensure non-negative
-                'growth_rate': self._calculate_growth_rate(
-                    revenue_data[-1] if revenue_data else 0,
-                    seasonal_value
-                )
-            })
-
-        return forecasts
-
-    def _forecast_expenses(self, historical_data: Dict, months: int) -> List[Dict]:
-        """Generate expense forecasts."""
-        expense_data = list(historical_data['expenses'].values())
-        
-        # Calculate fixed and variable expenses
-        if expense_data:
-            fixed_expenses = min(expense_data)  # Assume minimum is fixed
-            variable_ratio = np.mean([
-                (total - fixed_expenses) / total 
-                for total in expense_data if total > fixed_expenses
-            ]) if any(e > fixed_expenses for e in expense_data) else 0
-        else:
-            fixed_expenses = 0
-            variable_ratio = 0
-
-        # Generate forecasts
-        forecasts = []
-        last_month = datetime.utcnow()
-
-        for i in range(months):
-            forecast_month = last_month + timedelta(days=30 * (i + 1))
-            
-            # Estimate expenses based on revenue forecast
-            revenue_forecast = self._forecast_revenue(historical_data, i + 1)[-1]['amount']
-            variable_expenses = revenue_forecast * variable_ratio
-            total_expenses = fixed_expenses + variable_expenses
-
-            forecasts.append({
-                'date': forecast_month.strftime('%Y-%m'),
-                'amount': total_expenses,
-                'breakdown': {
-                    'fixed': fixed_expenses,
-                    'variable': variable_expenses
-                }
-            })
-
-        return forecasts
-
-    def _forecast_cash_flow(self, revenue_forecast: List[Dict], expense_forecast: List[Dict]) -> List[Dict]:
-        """Generate cash flow forecasts."""
-        cash_flow = []
-        
-        for i in range(len(revenue_forecast)):
-            month_revenue = revenue_forecast[i]['amount']
-            month_expenses = expense_forecast[i]['amount']
-            
-            cash_flow.append({
-                'date': revenue_forecast[i]['date'],
-                'net_cash_flow': month_revenue - month_expenses,
-                'revenue': month_revenue,
-                'expenses': month_expenses
-            })
-
-        return cash_flow
-
-    def _calculate_seasonal_factors(self, data: List[float]) -> List[float]:
-        """Calculate seasonal factors from historical data."""
+            trend = [revenue_data.mean(), 0] if n else [0, 0]
+            seasonal_factors = np.ones(12)
+
+        dates, month_index = _forecast_calendar(start, months)
+
+        trend_values = trend[0] * np.arange(n, n + months) + trend[1]
+        seasonal_values = trend_values * seasonal_factors[month_index]
+        revenue = np.maximum(0, seasonal_values)  # Ensure non-negative
+
+        previous = revenue_data[-1] if n else 0
+        growth_rate = (seasonal_values - previous) / previous if previous else np.zeros(months)
+
+        fixed_expenses, variable_ratio = self._expense_profile(historical_data)
+        variable = revenue * variable_ratio
+
+        return Projection(
+            dates=dates,
+            revenue=revenue,
+            growth_rate=growth_rate,
+            fixed=fixed_expenses,
+            variable=variable,
+            expenses=fixed_expenses + variable
+        )
+
+    def _expense_profile(self, historical_data: Dict):
+        """Split historical expenses into a fixed floor and a variable share of revenue."""
+        expense_data = np.fromiter(historical_data['expenses'].values(), dtype=float)
+        if not expense_data.size:
+            return 0, 0
+
+        fixed_expenses = float(expense_data.min())  # Assume minimum is fixed
+        above_fixed = expense_data[expense_data > fixed_expenses]
+        variable_ratio = float(np.mean((above_fixed - fixed_expenses) / above_fixed)) if above_fixed.size else 0
+        return fixed_expenses, variable_ratio
+
+    def _calculate_seasonal_factors(self, data: np.ndarray, month_keys: List[str]) -> np.ndarray:
+        """Calculate seasonal factors per calendar month from historical data.
+
+        month_keys are the 'YYYY-MM' labels of data, so each value lands on its
+        own calendar month whichever month the history starts in. Months with
+        no history keep a neutral factor of 1.
+        """
         if len(data) < 12:
-            return [1.0] * 12
-
-        # Calculate average value for each month
-        monthly_avgs = []
-        for i in range(12):
-            month_values = data[i::12]
-            monthly_avgs.append(np.mean(month_values) if month_values else 1.0)
-
-        # Normalize factors
-        overall_avg = np.mean(monthly_avgs)
-        seasonal_factors = [m / overall_avg for m in monthly_avgs]
-
-        return seasonal_factors
-
-    def _calculate_growth_rate(self, previous: float, current: float) -> float:
-        """Calculate growth rate between two values."""
-        if previous == 0:
-            return 0
-        return (current - previous) / previous
-
-    def _calculate_financial_metrics(self, revenue_forecast: List[Dict], expense_forecast: List[Dict]) -> Dict:
-        """Calculate key financial metrics from forecasts."""
-        total_revenue = sum(f['amount'] for f in revenue_forecast)
-        total_expenses = sum(f['amount'] for f in expense_forecast)
-        
+            return np.ones(12)
+
+        # Average value for each month, normalised by the overall average
+        month_of = np.fromiter((int(key[5:7]) - 1 for key in month_keys), dtype=np.intp, count=len(data))
+        counts = np.bincount(month_of, minlength=12)
+        sums = np.bincount(month_of, weights=data, minlength=12)
+        monthly_avgs = sums[counts > 0] / counts[counts > 0]
+        overall = monthly_avgs.mean()
+        if not overall:
+            return np.ones(12)
+
+        factors = np.ones(12)
+        factors[counts > 0] = monthly_avgs / overall
+        return factors
+
+    def _metrics(self, revenue: np.ndarray, expenses: np.ndarray) -> Dict:
+        total_revenue = float(revenue.sum())
+        total_expenses = float(expenses.sum())
+        profitable = np.flatnonzero(revenue > expenses)
+
         return {
             'projected_profit_margin': (total_revenue - total_expenses) / total_revenue if total_revenue > 0 else 0,
-            'average_monthly_revenue': total_revenue / len(revenue_forecast),
-            'average_monthly_expenses': total_expenses / len(expense_forecast),
-            'breakeven_months': next(
-                (i for i, (r, e) in enumerate(zip(revenue_forecast, expense_forecast))
-                 if r['amount'] > e['amount']),
-                None
-            )
+            'average_monthly_revenue': total_revenue / len(revenue),
+            'average_monthly_expenses': total_expenses / len(expenses),
+            'breakeven_months': int(profitable[0]) if profitable.size else None
         }
 
     def generate_financial_scenarios(self, business_id: int, months: int = 12) -> Dict:
         """Generate optimistic, pessimistic, and realistic financial scenarios."""
-        base_forecast = self.generate_financial_forecast(business_id, months)
-        
+        # One projection feeds all three scenarios; each only rescales it
+        projection = self._projection_for(business_id, months)
+
         scenarios = {
-            'optimistic': self._adjust_forecast(base_forecast, 1.2, 0.9),
-            'realistic': base_forecast,
-            'pessimistic': self._adjust_forecast(base_forecast, 0.8, 1.1)
+            'optimistic': self._build_forecast(projection, 1.2, 0.9),
+            'realistic': self._build_forecast(projection),
+            'pessimistic': self._build_forecast(projection, 0.8, 1.1)
         }
-        
-        return scenarios
 
-    def _adjust_forecast(self, forecast: Dict, revenue_multiplier: float, expense_multiplier: float) -> Dict:
-        """Adjust forecasts for different scenarios."""
-        adjusted = {
-            'revenue_forecast': [
-                {**f, 'amount': f['amount'] * revenue_multiplier}
-                for f in forecast['revenue_forecast']
-            ],
-            'expense_forecast': [
-                {**f, 'amount': f['amount'] * expense_multiplier}
-                for f in forecast['expense_forecast']
-            ]
-        }
-        
-        # Recalculate cash flow and metrics
-        adjusted['cash_flow_forecast'] = self._forecast_cash_flow(
-            adjusted['revenue_forecast'],
-            adjusted['expense_forecast']
-        )
-        adjusted['metrics'] = self._calculate_financial_metrics(
-            adjusted['revenue_forecast'],
-            adjusted['expense_forecast']
-        )
-        
-        return adjusted
+        return scenarios
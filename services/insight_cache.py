@@ -0,0 +1,82 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+DEFAULT_TTL = int(os.getenv('INSIGHT_CACHE_TTL', '86400'))
+
+_local = threading.local()
+
+
+def _db_path() -> str:
+    return os.getenv('INSIGHT_CACHE_PATH', 'llc_formation.db')
+
+
+def _connection() -> sqlite3.Connection:
+    """Return this thread's connection to the shared cache database."""
+    path = _db_path()
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'path', None) != path:
+        conn = sqlite3.connect(path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS insight_cache ("
+            "key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.commit()
+        _local.conn = conn
+        _local.path = path
+    return conn
+
+
+def make_key(*parts) -> str:
+    """Build a cache key from the values that determine a completion."""
+    return hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def get(key: str, ttl: int = DEFAULT_TTL) -> Optional[str]:
+    """Return cached content for key, or None when missing or older than ttl seconds."""
+    row = _connection().execute(
+        "SELECT content FROM insight_cache WHERE key = ? AND created_at >= ?",
+        (key, time.time() - ttl)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def put(key: str, content: str) -> None:
+    """Store content under key, replacing any previous entry."""
+    conn = _connection()
+    conn.execute(
+        "INSERT OR REPLACE INTO insight_cache (key, content, created_at) VALUES (?, ?, ?)",
+        (key, content, time.time())
+    )
+    conn.commit()
+
+
+def purge(ttl: int = DEFAULT_TTL) -> int:
+    """Delete entries older than ttl seconds and return how many were removed."""
+    conn = _connection()
+    cursor = conn.execute(
+        "DELETE FROM insight_cache WHERE created_at < ?",
+        (time.time() - ttl,)
+    )
+    conn.commit()
+    return cursor.rowcount
+
+
+def start_purger(interval: int = 3600, ttl: int = DEFAULT_TTL) -> threading.Thread:
+    """Run purge() every interval seconds on a daemon thread."""
+    def _run():
+        while True:
+            time.sleep(interval)
+            try:
+                purge(ttl)
+            except sqlite3.Error:
+                continue
+
+    thread = threading.Thread(target=_run, name='insight-cache-purger', daemon=True)
+    thread.start()
+    return thread
@@ -1,15 +1,70 @@
-import openai
+import asyncio
 from sqlalchemy.orm import Session
 from models import Business
 from typing import Dict, Any, List, Optional
-import json
-import os
-from openai import AsyncOpenAI
+import orjson
+from services import insight_cache
+from services.openai_client import (
+    MAX_CONCURRENT_COMPLETIONS, completion_flight, default_throttle, get_async_client
+)
+
+DETAILS_PROMPT = """Based on the following user's description, generate detailed LLC information:
+User Description: {user_prompt}
+
+Generate a JSON response with the following structure:
+{{
+    "name": "LLC name",
+    "industry": "Industry type",
+    "state": "State of registration",
+    "is_nonprofit": false,
+    "tax_classification": "Tax classification type",
+    "mission_statement": "Mission statement if nonprofit",
+    "target_market": "Target market description",
+    "business_model": "Business model description",
+    "revenue_streams": ["List of revenue streams"],
+    "key_activities": ["List of key activities"]
+}}
+
+Ensure the response is valid JSON with proper quotes and boolean values.
+"""
+
+PLAN_PROMPT = """Plan the registration and setup of an LLC with the following details:
+State: {state}
+Industry: {industry}
+Is Nonprofit: {is_nonprofit}
+
+Return a JSON object with exactly these keys:
+- "registration_steps": an array of objects with 'step_number', 'description', and 'requirements' keys
+- "required_documents": an array of objects with 'document_name', 'description', and 'required' (boolean) keys
+- "estimated_costs": an object with cost categories as keys and amounts as numeric values,
+  including filing fees, legal fees, licenses, permits, etc.
+- "timeline": an array of objects with 'phase', 'duration', and 'description' keys,
+  covering all major phases from initial filing to final approval
+Example:
+{{
+    "registration_steps": [
+        {{"step_number": 1, "description": "Choose a business name", "requirements": ["Must be unique", "Must include LLC"]}}
+    ],
+    "required_documents": [
+        {{"document_name": "Articles of Organization", "description": "Legal document establishing the LLC", "required": true}}
+    ],
+    "estimated_costs": {{"filing_fee": 100, "legal_fees": 500, "licenses": 200}},
+    "timeline": [
+        {{"phase": "Initial Filing", "duration": "1-2 weeks", "description": "Submit Articles of Organization"}}
+    ]
+}}
+"""
+
 
 class LLCBuilderService:
+    # JSON mode needs a model newer than gpt-4
+    MODEL = "gpt-4o"
+    _PLAN_KEYS = ("registration_steps", "required_documents", "estimated_costs", "timeline")
+
     def __init__(self, session: Session):
         self.session = session
-        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = get_async_client()
+        self._completion_slots = asyncio.Semaphore(MAX_CONCURRENT_COMPLETIONS)
 
     async def build_llc_from_prompt(self, user_prompt: str) -> Dict:
         """Build LLC details based on user's natural language prompt."""
@@ -28,14 +83,8 @@ class LLCBuilderService:
         
         self.session.add(new_llc)
         self.session.commit()
-        
-        return {
-            "llc_details": llc_details,
-            "registration_steps": await self._generate_registration_steps(llc_details),
-            "required_documents": await self._generate_required_documents(llc_details),
-            "estimated_costs": await self._generate_cost_estimates(llc_details),
-            "timeline": await self._generate_timeline(llc_details)
-        }
+
+        return {"llc_details": llc_details, **await self._generate_formation_plan(llc_details)}
 
     async def create_llc(self, name: str, industry: str, state: str, is_nonprofit: bool = False,
                         tax_classification: str = "LLC", mission_statement: str = None) -> Business:
@@ -55,138 +104,44 @@ class LLCBuilderService:
 
     async def _generate_llc_details(self, user_prompt: str) -> Dict:
         """Generate LLC details using OpenAI based on user prompt."""
-        prompt = f"""Based on the following user's description, generate detailed LLC information:
-        User Description: {user_prompt}
-        
-        Generate a JSON response with the following structure:
-        {{
-            "name": "LLC name",
-            "industry": "Industry type",
-            "state": "State of registration",
-            "is_nonprofit": false,
-            "tax_classification": "Tax classification type",
-            "mission_statement": "Mission statement if nonprofit",
-            "target_market": "Target market description",
-            "business_model": "Business model description",
-            "revenue_streams": ["List of revenue streams"],
-            "key_activities": ["List of key activities"]
-        }}
-        
-        Ensure the response is valid JSON with proper quotes and boolean values.
-        """
-        
-        response = await self.client.create_completion(
-            model="gpt-4",
-            prompt=prompt,
-            temperature=0.7
-        )
-        
-        return json.loads(response.choices[0].text)
-
-    async def _generate_registration_steps(self, llc_details: Dict) -> List[Dict]:
-        """Generate registration steps based on LLC details."""
-        prompt = f"""Generate detailed registration steps for an LLC with the following details:
-        Name: {llc_details['name']}
-        State: {llc_details['state']}
-        Industry: {llc_details['industry']}
-        Is Nonprofit: {llc_details.get('is_nonprofit', False)}
-        
-        Return a JSON array of objects with 'step_number', 'description', and 'requirements' keys.
-        Example:
-        [
-            {{
-                "step_number": 1,
-                "description": "Choose a business name",
-                "requirements": ["Must be unique", "Must include LLC"]
-            }}
-        ]
-        """
-        
-        response = await self.client.create_completion(
-            model="gpt-4",
-            prompt=prompt,
-            temperature=0.7
-        )
-        
-        return json.loads(response.choices[0].text)
-
-    async def _generate_required_documents(self, llc_details: Dict) -> List[Dict]:
-        """Generate list of required documents based on LLC details."""
-        prompt = f"""List all required documents for registering an LLC with the following details:
-        Name: {llc_details['name']}
-        State: {llc_details['state']}
-        Industry: {llc_details['industry']}
-        Is Nonprofit: {llc_details.get('is_nonprofit', False)}
-        
-        Return a JSON array of objects with 'document_name', 'description', and 'required' (boolean) keys.
-        Example:
-        [
-            {{
-                "document_name": "Articles of Organization",
-                "description": "Legal document establishing the LLC",
-                "required": true
-            }}
-        ]
-        """
-        
-        response = await self.client.create_completion(
-            model="gpt-4",
-            prompt=prompt,
-            temperature=0.7
-        )
-        
-        return json.loads(response.choices[0].text)
-
-    async def _generate_cost_estimates(self, llc_details: Dict) -> Dict:
-        """Generate cost estimates for LLC registration and setup."""
-        prompt = f"""Generate detailed cost estimates for registering and setting up an LLC with the following details:
-        Name: {llc_details['name']}
-        State: {llc_details['state']}
-        Industry: {llc_details['industry']}
-        Is Nonprofit: {llc_details.get('is_nonprofit', False)}
-        
-        Return a JSON object with categories as keys and amounts as numeric values.
-        Include filing fees, legal fees, licenses, permits, etc.
-        Example:
-        {{
-            "filing_fee": 100,
-            "legal_fees": 500,
-            "licenses": 200
-        }}
-        """
+        prompt = DETAILS_PROMPT.format(user_prompt=user_prompt)
         
-        response = await self.client.create_completion(
-            model="gpt-4",
-            prompt=prompt,
-            temperature=0.7
-        )
-        
-        return json.loads(response.choices[0].text)
-
-    async def _generate_timeline(self, llc_details: Dict) -> List[Dict]:
-        """Generate estimated timeline for LLC setup and registration."""
-        prompt = f"""Generate a detailed timeline for setting up and registering an LLC with the following details:
-        Name: {llc_details['name']}
-        State: {llc_details['state']}
-        Industry: {llc_details['industry']}
-        Is Nonprofit: {llc_details.get('is_nonprofit', False)}
+        response = await self._complete(prompt)
         
-        Return a JSON array of objects with 'phase', 'duration', and 'description' keys.
-        Include all major phases from initial filing to final approval.
-        Example:
-        [
-            {{
-                "phase": "Initial Filing",
-                "duration": "1-2 weeks",
-                "description": "Submit Articles of Organization"
-            }}
-        ]
+        return orjson.loads(response.choices[0].message.content)
+
+    async def _generate_formation_plan(self, llc_details: Dict) -> Dict:
+        """Generate registration steps, documents, costs and timeline in one completion.
+
+        The plan depends only on state, industry and nonprofit status, so it is
+        cached on those; the template text is part of the key, so editing the
+        prompt invalidates earlier entries.
         """
-        
-        response = await self.client.create_completion(
-            model="gpt-4",
-            prompt=prompt,
-            temperature=0.7
+        prompt = PLAN_PROMPT.format(
+            state=llc_details['state'],
+            industry=llc_details['industry'],
+            is_nonprofit=llc_details.get('is_nonprofit', False)
         )
-        
-        return json.loads(response.choices[0].text)
+        key = insight_cache.make_key(self.MODEL, prompt)
+
+        async def _fetch():
+            content = insight_cache.get(key)
+            if content is None:
+                response = await self._complete(prompt)
+                content = response.choices[0].message.content
+                insight_cache.put(key, content)
+            return content
+
+        plan = orjson.loads(await completion_flight.do(key, _fetch))
+        return {name: plan.get(name) for name in self._PLAN_KEYS}
+
+    async def _complete(self, prompt: str):
+        """Request a JSON completion within the shared rate limits, retrying transient errors."""
+        async with self._completion_slots:
+            return await default_throttle.submit(
+                self.client,
+                model=self.MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7,
+                response_format={"type": "json_object"}
+            )
@@ -1,19 +1,39 @@
-import openai
-import requests
+import asyncio
+import httpx
 from typing import List, Dict
 import json
 import re
+from services.openai_client import acreate_chat_completion, get_async_client
+
+# State registries throttle aggressively; keep only a few lookups in flight
+MAX_CONCURRENT_AVAILABILITY_CHECKS = 5
+
+# LLC, Inc, Corp, etc. are stripped before a name is checked
+_IDENTIFIER_RE = re.compile(
+    r'\b(?:L\.?L\.?C\.?|INC\.?|CORP\.?|INCORPORATED|CORPORATION|COMPANY|LIMITED|LTD\.?)\b',
+    re.IGNORECASE
+)
+# Matched anywhere in the name, so "BANKING" is restricted as well as "BANK"
+_RESTRICTED_RE = re.compile(r'BANK|INSURANCE|FEDERAL|NATIONAL|UNITED STATES|RESERVE')
+_INVALID_CHAR_RE = re.compile(r'[^a-zA-Z0-9\s&\'-]')
+# A line like "1. Name:" or "Name:" starts a suggestion; the lines up to the
+# next such line are its explanation
+_ENTRY_RE = re.compile(
+    r'^[ \t]*(?=[^:\s])(?:\d+\.)?[ \t]*([^:\n]+):.*((?:\n(?![ \t]*[^:\s][^:\n]*:).*)*)',
+    re.MULTILINE
+)
 
 class NameGeneratorService:
     def __init__(self, db_session):
         self.db_session = db_session
+        self.client = get_async_client()
         self.state_api_endpoints = {
             'DE': 'https://icis.corp.delaware.gov/api/name-availability',
             'WY': 'https://wyobiz.wyo.gov/api/name-availability',
             # Add more state APIs as needed
         }
 
-    def generate_business_names(self, industry: str, keywords: List[str], state: str) -> List[Dict]:
+    async def generate_business_names(self, industry: str, keywords: List[str], state: str) -> List[Dict]:
         """Generate business name suggestions using OpenAI and check availability."""
         
         # Create a detailed prompt for OpenAI
@@ -32,7 +52,8 @@ class NameGeneratorService:
         """
 
         # Generate names using OpenAI
-        response = openai.ChatCompletion.create(
+        response = await acreate_chat_completion(
+            self.client,
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are a business naming expert."},
@@ -42,11 +63,30 @@ class NameGeneratorService:
 
         # Parse the response and extract names
         generated_names = self._parse_generated_names(response.choices[0].message.content)
-        
-        # Check availability for each name
-        available_names = []
+
+        # Only unique names that pass local validation can be available, so
+        # duplicates and invalid names never reach the state lookup
+        seen = set()
+        candidates = []
         for name in generated_names:
-            availability = self.check_name_availability(f"{name['name']}, LLC", state)
+            normalized = self._normalize_business_name(name['name'])
+            if normalized in seen:
+                continue
+            seen.add(normalized)
+            if self._validate_name_format(normalized)['valid']:
+                candidates.append(name)
+
+        # Check availability for every candidate concurrently
+        slots = asyncio.Semaphore(MAX_CONCURRENT_AVAILABILITY_CHECKS)
+
+        async def _check(name: Dict) -> Dict:
+            async with slots:
+                return await self.check_name_availability(f"{name['name']}, LLC", state)
+
+        results = await asyncio.gather(*(_check(name) for name in candidates))
+
+        available_names = []
+        for name, availability in zip(candidates, results):
             name['available'] = availability['available']
             name['conflicts'] = availability.get('conflicts', [])
             if availability['available']:
@@ -56,39 +96,13 @@ class NameGeneratorService:
 
     def _parse_generated_names(self, content: str) -> List[Dict]:
         """Parse the OpenAI response and extract names with explanations."""
-        names = []
-        lines = content.split('\n')
-        current_name = None
-        current_explanation = []
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        return [
+            {'name': match.group(1).strip(), 'explanation': ' '.join(match.group(2).split())}
+            for match in _ENTRY_RE.finditer(content)
+            if match.group(1).strip()
+        ]
 
-            # Look for patterns like "1. Name:" or "Name:"
-            name_match = re.match(r'^(?:\d+\.)?\s*([^:]+):', line)
-            if name_match:
-                if current_name:
-                    names.append({
-                        'name': current_name,
-                        'explanation': ' '.join(current_explanation)
-                    })
-                current_name = name_match.group(1).strip()
-                current_explanation = []
-            elif current_name:
-                current_explanation.append(line)
-
-        # Add the last name if exists
-        if current_name:
-            names.append({
-                'name': current_name,
-                'explanation': ' '.join(current_explanation)
-            })
-
-        return names
-
-    def check_name_availability(self, name: str, state: str) -> Dict:
+    async def check_name_availability(self, name: str, state: str) -> Dict:
         """Check if a business name is available in the specified state."""
         # Remove common business identifiers for checking
         check_name = self._normalize_business_name(name)
@@ -103,7 +117,7 @@ class NameGeneratorService:
                 }
 
             # Mock API call for now - in production, would call actual state APIs
-            # return self._call_state_api(name, state)
+            # return await self._call_state_api(name, state)
             
             # For demonstration, return mock response
             return {
@@ -119,22 +133,7 @@ class NameGeneratorService:
 
     def _normalize_business_name(self, name: str) -> str:
         """Remove common business identifiers and normalize the name."""
-        # Remove LLC, Inc, Corp, etc.
-        identifiers = [
-            r'\bL\.?L\.?C\.?\b',
-            r'\bINC\.?\b',
-            r'\bCORP\.?\b',
-            r'\bINCORPORATED\b',
-            r'\bCORPORATION\b',
-            r'\bCOMPANY\b',
-            r'\bLIMITED\b',
-            r'\bLTD\.?\b'
-        ]
-        
-        name = name.upper()
-        for identifier in identifiers:
-            name = re.sub(identifier, '', name, flags=re.IGNORECASE)
-        
+        name = _IDENTIFIER_RE.sub('', name.upper())
         return name.strip().strip(',').strip()
 
     def _validate_name_format(self, name: str) -> Dict:
@@ -147,16 +146,15 @@ class NameGeneratorService:
             }
 
         # Check for restricted words
-        restricted_words = ['BANK', 'INSURANCE', 'FEDERAL', 'NATIONAL', 'UNITED STATES', 'RESERVE']
-        for word in restricted_words:
-            if word in name.upper():
-                return {
-                    'valid': False,
-                    'reason': f'Name contains restricted word: {word}'
-                }
+        restricted = _RESTRICTED_RE.search(name.upper())
+        if restricted:
+            return {
+                'valid': False,
+                'reason': f'Name contains restricted word: {restricted.group()}'
+            }
 
         # Check for special characters
-        if re.search(r'[^a-zA-Z0-9\s&\'-]', name):
+        if _INVALID_CHAR_RE.search(name):
             return {
                 'valid': False,
                 'reason': 'Name contains invalid special characters'
@@ -164,20 +162,20 @@ class NameGeneratorService:
 
         return {'valid': True}
 
-    def _call_state_api(self, name: str, state: str) -> Dict:
+    async def _call_state_api(self, name: str, state: str) -> Dict:
         """Call the state's business entity API to check name availability."""
         if state not in self.state_api_endpoints:
             raise ValueError(f"No API endpoint configured for state: {state}")
 
         try:
-            response = requests.get(
-                self.state_api_endpoints[state],
-                params={'name': name},
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            async with httpx.AsyncClient(timeout=10) as client:
+                response = await client.get(
+                    self.state_api_endpoints[state],
+                    params={'name': name}
+                )
+                response.raise_for_status()
+                return response.json()
+        except httpx.HTTPError as e:
             raise Exception(f"Error calling state API: {str(e)}")
 
     def generate_domain_suggestions(self, business_name: str) -> List[Dict]:
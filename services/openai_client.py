@@ -0,0 +1,233 @@
+import asyncio
+import functools
+import os
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+# Transient failures worth retrying; bad requests and auth errors fail immediately
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+# Upper bound on OpenAI requests one service instance keeps in flight
+MAX_CONCURRENT_COMPLETIONS = int(os.getenv("MAX_CONCURRENT_COMPLETIONS", "10"))
+
+class LoopBoundClient:
+    """Hand each event loop its own async client, created on first use from that loop.
+
+    An httpx pool's connections belong to the loop that opened them, so a
+    client reused from a later loop (a sync caller doing asyncio.run per
+    request) fails with "Event loop is closed". Attribute access is forwarded
+    to the running loop's client, so services may hold this object and be
+    built outside any loop. Outside a loop only coroutine methods can be used
+    (client.post(...) passed to asyncio.run); they pick the client of the
+    loop that awaits them. A loop's client is dropped with the loop; close it
+    first with aclose() to release its connections promptly.
+    """
+
+    def __init__(self, factory: Callable[[], Any], close: Callable[[Any], Awaitable[None]]):
+        self._factory = factory
+        self._close = close
+        self._clients = weakref.WeakKeyDictionary()
+
+    def get(self) -> Any:
+        """Return the running loop's client, creating it if this loop has none yet."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = self._factory()
+        return client
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            client = self.get()
+        except RuntimeError:
+            return functools.partial(self._call, name)
+        return getattr(client, name)
+
+    async def _call(self, name: str, *args, **kwargs) -> Any:
+        return await getattr(self.get(), name)(*args, **kwargs)
+
+    async def aclose(self) -> None:
+        """Close the running loop's client; the next use on this loop opens a new one."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await self._close(client)
+
+
+def _create_async_client() -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=httpx.AsyncClient(
+            timeout=60.0,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+        ),
+    )
+
+
+_async_client = LoopBoundClient(_create_async_client, lambda client: client.close())
+
+
+def get_async_client() -> AsyncOpenAI:
+    """Return the process-wide AsyncOpenAI client, one per event loop.
+
+    Sharing one client per loop keeps a single warm connection pool, so
+    services built per request don't each pay a fresh TLS handshake.
+    """
+    return _async_client
+
+
+async def close_async_client() -> None:
+    """Close the running loop's client pool; the next use on this loop opens a new one."""
+    await _async_client.aclose()
+
+
+openai_retry = retry(
+    wait=wait_exponential_jitter(initial=1, max=10),
+    stop=stop_after_attempt(5),
+    retry=retry_if_exception_type(RETRYABLE_ERRORS),
+    reraise=True,
+)
+
+
+@openai_retry
+def create_chat_completion(**kwargs):
+    """Create a chat completion with the module-level client, retrying transient errors."""
+    return openai.chat.completions.create(**kwargs)
+
+
+@openai_retry
+async def acreate_chat_completion(client, **kwargs):
+    """Create a chat completion with an AsyncOpenAI client, retrying transient errors."""
+    return await client.chat.completions.create(**kwargs)
+
+
+@openai_retry
+async def acreate_embedding(client, **kwargs):
+    """Create embeddings with an AsyncOpenAI client, retrying transient errors."""
+    return await client.embeddings.create(**kwargs)
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one in-flight call.
+
+    The first caller for a key runs the coroutine; everyone else arriving
+    before it finishes awaits the same future instead of issuing a duplicate
+    request. Checking and registering the future happens without an await in
+    between, so no lock is needed on a single event loop.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._inflight.get(key)
+        if fut is not None:
+            return await asyncio.shield(fut)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as exc:
+            fut.set_exception(exc)
+            # Mark retrieved so a leader without followers doesn't log a warning
+            fut.exception()
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+
+completion_flight = SingleFlight()
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> int:
+    """Rough token count for a request: ~4 characters per token plus per-message overhead."""
+    prompt_tokens = sum(len(m.get("content") or "") // 4 + 4 for m in messages)
+    return prompt_tokens + (max_tokens or 0)
+
+
+class OpenAIThrottle:
+    """Token buckets for requests and tokens per minute, applied before each request.
+
+    Capacity refills continuously, so bursts up to the per-minute limits go out
+    immediately and anything beyond waits locally instead of drawing a 429.
+    """
+
+    def __init__(self, max_requests_per_minute: int, max_tokens_per_minute: int):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.available_request_capacity = float(max_requests_per_minute)
+        self.available_token_capacity = float(max_tokens_per_minute)
+        self._last_update = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_update
+        self._last_update = now
+        self.available_request_capacity = min(
+            self.max_requests_per_minute,
+            self.available_request_capacity + elapsed * self.max_requests_per_minute / 60
+        )
+        self.available_token_capacity = min(
+            self.max_tokens_per_minute,
+            self.available_token_capacity + elapsed * self.max_tokens_per_minute / 60
+        )
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until both buckets can admit a request costing tokens."""
+        tokens = min(tokens, self.max_tokens_per_minute)
+        while True:
+            self._refill()
+            if self.available_request_capacity >= 1 and self.available_token_capacity >= tokens:
+                self.available_request_capacity -= 1
+                self.available_token_capacity -= tokens
+                return
+            request_wait = (1 - self.available_request_capacity) * 60 / self.max_requests_per_minute
+            token_wait = (tokens - self.available_token_capacity) * 60 / self.max_tokens_per_minute
+            await asyncio.sleep(max(request_wait, token_wait, 0.01))
+
+    async def submit(self, client, **kwargs):
+        """Create a chat completion once the buckets admit it, retrying transient errors."""
+        cost = estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+
+        # Every attempt, retries included, is charged against the buckets
+        @openai_retry
+        async def _attempt():
+            await self.acquire(cost)
+            return await client.chat.completions.create(**kwargs)
+
+        response = await _attempt()
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.reconcile(cost, usage.total_tokens)
+        return response
+
+    def reconcile(self, estimated: int, actual: int) -> None:
+        """Correct the token bucket once a response reports what it really used."""
+        self._refill()
+        self.available_token_capacity = min(
+            self.max_tokens_per_minute,
+            self.available_token_capacity + min(estimated, self.max_tokens_per_minute) - actual
+        )
+
+
+# Shared by every service in the process so the limits apply account-wide
+default_throttle = OpenAIThrottle(
+    max_requests_per_minute=int(os.getenv("OPENAI_MAX_REQUESTS_PER_MINUTE", "3500")),
+    max_tokens_per_minute=int(os.getenv("OPENAI_MAX_TOKENS_PER_MINUTE", "90000")),
+)
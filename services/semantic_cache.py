@@ -0,0 +1,81 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+DEFAULT_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+
+
+class SemanticCache:
+    """Two-tier cache of completions keyed by prompt text.
+
+    An exact match on the text is checked first; failing that, the prompt's
+    embedding is compared against earlier prompts in the same namespace and
+    the closest one is served if its cosine similarity clears the threshold.
+    Namespaces keep one tenant's answers from reaching another.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, max_entries: int = 256):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._exact: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        # namespace -> (unit-length embeddings stacked row-wise, payload per row)
+        self._vectors: Dict[str, Tuple[np.ndarray, list]] = {}
+        self._lock = threading.Lock()
+
+    def get_exact(self, namespace: str, text: str) -> Optional[Dict[str, Any]]:
+        """Return the payload stored for exactly this text, if any."""
+        with self._lock:
+            payload = self._exact.get((namespace, text))
+            if payload is not None:
+                self._exact.move_to_end((namespace, text))
+            return payload
+
+    def lookup(self, namespace: str, embedding: Sequence[float]) -> Optional[Dict[str, Any]]:
+        """Return the payload of the most similar stored prompt above the threshold."""
+        with self._lock:
+            entry = self._vectors.get(namespace)
+            if entry is None:
+                return None
+            matrix, payloads = entry
+            scores = matrix @ _unit(embedding)
+            best = int(np.argmax(scores))
+            return payloads[best] if scores[best] >= self.threshold else None
+
+    def store(self, namespace: str, text: str,
+              embedding: Optional[Sequence[float]], payload: Dict[str, Any]) -> None:
+        """Remember payload for text, and for its embedding when one is given."""
+        with self._lock:
+            self._exact[(namespace, text)] = payload
+            if len(self._exact) > self.max_entries * 4:
+                self._exact.popitem(last=False)
+
+            if embedding is None:
+                return
+            vector = _unit(embedding)[np.newaxis, :]
+            matrix, payloads = self._vectors.get(namespace, (None, []))
+            if matrix is None:
+                matrix = vector
+            else:
+                # Oldest rows drop off once the namespace is full
+                matrix = np.vstack((matrix[-(self.max_entries - 1):], vector))
+                payloads = payloads[-(self.max_entries - 1):]
+            self._vectors[namespace] = (matrix, payloads + [payload])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._exact.clear()
+            self._vectors.clear()
+
+
+def _unit(embedding: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+# Shared by every ChatService so cached answers outlive a single request
+response_cache = SemanticCache()
@@ -1,38 +1,162 @@
-import requests
-from typing import Dict, Any
-import json
+import asyncio
+import httpx
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, ClassVar, Dict, List, Optional
+import orjson
 from datetime import datetime
 from models import Business, Document
+from sqlalchemy import Row, insert, select
+from sqlalchemy.orm import selectinload
 import os
-import base64
+import ssl
+import threading
+from cachetools import TTLCache
+from services.openai_client import LoopBoundClient
+import binascii
+
+# Filings one batch keeps in flight against any single state's API
+MAX_CONCURRENT_FILINGS_PER_STATE = int(os.getenv('MAX_CONCURRENT_FILINGS_PER_STATE', '16'))
+
+# Loading the CA bundle is the slow part of building a context, so it is done
+# once and shared by every client the process creates
+_SSL_CONTEXT = ssl.create_default_context()
+
+# Filing pipeline workers, and how a pending filing's status is re-polled:
+# the delay doubles from STATUS_POLL_INTERVAL up to MAX_STATUS_POLL_INTERVAL
+MAX_FILING_WORKERS = int(os.getenv('MAX_FILING_WORKERS', '32'))
+STATUS_POLL_INTERVAL = 60.0
+MAX_STATUS_POLL_INTERVAL = 3600.0
+MAX_STATUS_POLLS = 10
+
+# Recent status responses by (state, filing number), so repeated polls within
+# a minute skip the state API
+_STATUS_CACHE = TTLCache(maxsize=10_000, ttl=60)
+_STATUS_CACHE_LOCK = threading.Lock()
+
+# The only draft document columns a filing payload needs
+_DRAFT_COLUMNS = (Document.name, Document.type, Document.content)
+
+
+def _create_state_api_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(30.0, connect=5.0),
+        # Only failed connection attempts are retried, so a formation is never resubmitted
+        transport=httpx.AsyncHTTPTransport(
+            verify=_SSL_CONTEXT,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            retries=3,
+        ),
+    )
+
+
+_http_client = LoopBoundClient(_create_state_api_client, lambda client: client.aclose())
+
+
+def get_state_api_client() -> httpx.AsyncClient:
+    """Return the process-wide client for state APIs, one per event loop.
+
+    Services are built per request, so a shared client is what lets filings,
+    status checks and document pulls reuse kept-alive connections to each
+    state host instead of handshaking every time. Its pools are bound to the
+    loop using them; see LoopBoundClient.
+    """
+    return _http_client
+
+
+async def warm_state_api_connections() -> None:
+    """Open a pooled connection to every state API host ahead of the first filing.
+
+    Await this on the event loop that will serve filings, so the first real
+    request skips DNS resolution and the TLS handshake. Unreachable hosts
+    are ignored; their first request simply connects as usual.
+    """
+    client = get_state_api_client()
+    await asyncio.gather(
+        *(client.head(config['base_url']) for config in StateFilingService.API_ENDPOINTS.values()),
+        return_exceptions=True
+    )
+
+
+async def close_state_api_client() -> None:
+    """Close the running loop's client pool; the next use on this loop opens a new one."""
+    await _http_client.aclose()
+
+
+@dataclass(slots=True)
+class FilingJob:
+    """One business moving through the filing pipeline in process_formations."""
+    SUBMIT: ClassVar[str] = 'submit'
+    POLL: ClassVar[str] = 'poll'
+    RETRIEVE: ClassVar[str] = 'retrieve'
+    DONE: ClassVar[str] = 'done'
+
+    business_id: int
+    business: Business
+    stage: str = SUBMIT
+    polls: int = 0
+
 
 class StateFilingService:
+    API_ENDPOINTS = {
+        'DE': {
+            'base_url': 'https://api.delaware.gov/business/v1',
+            'formation': '/formation/llc',
+            'status': '/status',
+            'documents': '/documents'
+        },
+        'WY': {
+            'base_url': 'https://api.wyo.gov/business/v1',
+            'formation': '/formation/llc',
+            'status': '/status',
+            'documents': '/documents'
+        }
+        # Add more state endpoints
+    }
+
+    # State-specific filing fees
+    STATE_FEES = {
+        'DE': {
+            'formation': 90.00,
+            'registered_agent': 50.00,
+            'expedited': 50.00,
+            'certified_copy': 30.00
+        },
+        'WY': {
+            'formation': 100.00,
+            'registered_agent': 50.00,
+            'expedited': 50.00,
+            'certified_copy': 30.00
+        }
+    }
+
+    _STATE_FEE_TOTALS = {state: sum(fees.values()) for state, fees in STATE_FEES.items()}
+
+    # Full URL per (state, endpoint type)
+    _ENDPOINT_URLS = {
+        (state, endpoint_type): config['base_url'] + path
+        for state, config in API_ENDPOINTS.items()
+        for endpoint_type, path in config.items()
+        if endpoint_type != 'base_url'
+    }
+
     def __init__(self, db_session):
         self.db_session = db_session
+        self.client = get_state_api_client()
         self.api_keys = {
             'DE': os.getenv('DELAWARE_API_KEY'),
             'WY': os.getenv('WYOMING_API_KEY'),
             # Add more state API keys
         }
-        self.api_endpoints = {
-            'DE': {
-                'base_url': 'https://api.delaware.gov/business/v1',
-                'formation': '/formation/llc',
-                'status': '/status',
-                'documents': '/documents'
-            },
-            'WY': {
-                'base_url': 'https://api.wyo.gov/business/v1',
-                'formation': '/formation/llc',
-                'status': '/status',
-                'documents': '/documents'
-            }
-            # Add more state endpoints
+        self.api_endpoints = self.API_ENDPOINTS
+        # Request headers never change per state, so every call shares one dict
+        self._headers_by_state = {
+            state: {'Authorization': f"Bearer {key}", 'Content-Type': 'application/json'}
+            for state, key in self.api_keys.items()
         }
 
     async def submit_llc_formation(self, business_id: int) -> Dict[str, Any]:
         """Submit LLC formation documents to the state."""
-        business = self.db_session.query(Business).get(business_id)
+        business = self.db_session.get(Business, business_id)
         if not business:
             raise ValueError("Business not found")
 
@@ -40,12 +164,198 @@ class StateFilingService:
         if state not in self.api_endpoints:
             raise ValueError(f"State {state} not supported")
 
+        try:
+            return await self._submit_formation(business)
+        finally:
+            self.db_session.commit()
+
+    async def submit_llc_formations(self, business_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Submit several LLC formations concurrently.
+
+        Each submission commits as soon as its response is recorded: a filing
+        the state has accepted must not be lost to a later cancellation or
+        crash, or the next run would submit that formation again.
+
+        Returns the submit_llc_formation result per business id, or an error
+        entry with a message for businesses that could not be submitted.
+        """
+        drafts = self._draft_documents(business_ids)
+
+        async def _submit(business: Business) -> Dict[str, Any]:
+            try:
+                return await self._submit_formation(business, drafts.get(business.id, []))
+            finally:
+                self.db_session.commit()
+
+        return await self._run_batch(business_ids, _submit)
+
+    async def check_filing_statuses(self, business_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Check several submitted formations concurrently, committing completions once."""
+        return await self._run_batch(business_ids, self._check_status)
+
+    async def retrieve_filed_documents_batch(self, business_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Retrieve filed documents for several businesses, inserting them in one transaction."""
+        return await self._run_batch(business_ids, self._store_filed_documents)
+
+    async def process_formations(self, business_ids: List[int], workers: int = MAX_FILING_WORKERS,
+                                 poll_interval: float = STATUS_POLL_INTERVAL) -> Dict[int, Dict[str, Any]]:
+        """Take many businesses from submission through to filed documents.
+
+        Each business is a FilingJob moving through submit, poll and retrieve
+        stages. Jobs wait on one queue, sorted by state so consecutive requests
+        reuse a host's connections, and a fixed pool of workers each advance
+        one job by one stage at a time. A pending filing is put back on the
+        queue after a growing delay instead of holding a worker while it
+        waits. Every stage commits as it finishes, so a crash mid-batch never
+        loses a filing number and resubmits that business.
+
+        Returns the final stage and status per business id, with a message
+        for businesses that failed or are not found.
+        """
+        businesses = self._load_businesses(business_ids)
+        businesses.sort(key=lambda business: business.state or '')
+        drafts = self._draft_documents(business_ids)
+
+        results = {
+            business_id: {'stage': FilingJob.SUBMIT, 'status': 'error', 'message': 'Business not found'}
+            for business_id in business_ids
+        }
+        if not businesses:
+            return results
+
+        queue: asyncio.Queue = asyncio.Queue()
+        remaining = len(businesses)
+        finished = asyncio.Event()
+        requeues = set()
+
+        def _finish(job: FilingJob, status: str, message: Optional[str] = None) -> None:
+            nonlocal remaining
+            results[job.business_id] = {'stage': job.stage, 'status': status}
+            if message is not None:
+                results[job.business_id]['message'] = message
+            remaining -= 1
+            if not remaining:
+                finished.set()
+
+        async def _requeue_later(job: FilingJob, delay: float) -> None:
+            await asyncio.sleep(delay)
+            queue.put_nowait(job)
+
+        async def _advance(job: FilingJob) -> None:
+            business = job.business
+            if job.stage == FilingJob.SUBMIT:
+                if business.state not in self.api_endpoints:
+                    raise ValueError(f"State {business.state} not supported")
+                try:
+                    await self._submit_formation(business, drafts.get(job.business_id, []))
+                finally:
+                    self.db_session.commit()
+                job.stage = FilingJob.POLL
+                queue.put_nowait(job)
+            elif job.stage == FilingJob.POLL:
+                response = await self._check_status(business, use_cache=False)
+                self.db_session.commit()
+                if response.get('status') == 'completed':
+                    job.stage = FilingJob.RETRIEVE
+                    queue.put_nowait(job)
+                elif job.polls >= MAX_STATUS_POLLS:
+                    _finish(job, 'pending')
+                else:
+                    delay = min(poll_interval * 2 ** job.polls, MAX_STATUS_POLL_INTERVAL)
+                    job.polls += 1
+                    task = asyncio.create_task(_requeue_later(job, delay))
+                    requeues.add(task)
+                    task.add_done_callback(requeues.discard)
+            else:
+                try:
+                    await self._store_filed_documents(business)
+                except Exception:
+                    self.db_session.rollback()
+                    raise
+                self.db_session.commit()
+                job.stage = FilingJob.DONE
+                _finish(job, 'completed')
+
+        async def _worker() -> None:
+            while True:
+                job = await queue.get()
+                try:
+                    await _advance(job)
+                except Exception as e:
+                    _finish(job, 'error', str(e))
+                finally:
+                    queue.task_done()
+
+        for business in businesses:
+            queue.put_nowait(FilingJob(business.id, business))
+        tasks = [asyncio.create_task(_worker()) for _ in range(min(workers, len(businesses)))]
+        try:
+            await finished.wait()
+        finally:
+            for task in (*tasks, *requeues):
+                task.cancel()
+            await asyncio.gather(*tasks, *requeues, return_exceptions=True)
+        return results
+
+    async def _run_batch(self, business_ids: List[int],
+                         worker: Callable[[Business], Awaitable[Dict[str, Any]]]) -> Dict[int, Dict[str, Any]]:
+        """Run worker for each business concurrently, then commit everything it recorded at once.
+
+        Status and document workers only stage changes, so a batch of any size
+        costs one commit; they are safe to repeat if it is rolled back.
+        Workers for non-idempotent calls commit their own changes instead.
+        Failures are reported per business id as an error entry.
+        """
+        businesses = self._load_businesses(business_ids)
+        # Grouped by state so each host's pooled connections are reused back to back
+        businesses.sort(key=lambda business: business.state or '')
+        slots = {
+            state: asyncio.Semaphore(MAX_CONCURRENT_FILINGS_PER_STATE)
+            for state in {business.state for business in businesses}
+        }
+
+        async def _run(business: Business) -> Dict[str, Any]:
+            if business.state not in self.api_endpoints:
+                raise ValueError(f"State {business.state} not supported")
+            async with slots[business.state]:
+                return await worker(business)
+
+        batch_ids = [business.id for business in businesses]
+        try:
+            outcomes = await asyncio.gather(
+                *(_run(business) for business in businesses),
+                return_exceptions=True
+            )
+        except BaseException:
+            self.db_session.rollback()
+            raise
+        self.db_session.commit()
+
+        results = {
+            business_id: {'status': 'error', 'message': 'Business not found'}
+            for business_id in business_ids
+        }
+        # Ids read before the commit, which expires the loaded rows
+        for business_id, outcome in zip(batch_ids, outcomes):
+            if isinstance(outcome, Exception):
+                results[business_id] = {'status': 'error', 'message': str(outcome)}
+            else:
+                results[business_id] = outcome
+        return results
+
+    async def _submit_formation(self, business: Business,
+                                drafts: Optional[List[Row]] = None) -> Dict[str, Any]:
+        """Send one business's formation to its state and record the outcome without committing."""
         # Prepare formation documents
-        documents = self._prepare_formation_documents(business)
-        
+        documents = self._prepare_formation_documents(business, drafts)
+
         # Submit to state API
         try:
-            response = await self._submit_to_state_api(state, 'formation', {
+            # Owner fields are read once and shared by the owners and contact entries
+            owner = business.owner
+            owner_name = f"{owner.first_name} {owner.last_name}"
+
+            response = await self._submit_to_state_api(business.state, 'formation', {
                 'business_name': business.name,
                 'business_type': 'LLC',
                 'documents': documents,
@@ -53,37 +363,59 @@ class StateFilingService:
                     'name': business.registered_agent,
                     'address': business.registered_agent_address
                 },
-                'owners': self._format_owners(business),
+                'owners': self._format_owners(business, owner_name),
                 'contact': {
-                    'name': f"{business.owner.first_name} {business.owner.last_name}",
-                    'email': business.owner.email,
+                    'name': owner_name,
+                    'email': owner.email,
                     'phone': business.phone
                 }
             })
 
             # Update business status
+            filing_number = response.get('filing_number')
             business.formation_status = 'submitted'
-            business.state_filing_number = response.get('filing_number')
-            self.db_session.commit()
+            business.state_filing_number = filing_number
 
             return {
                 'status': 'success',
-                'filing_number': response.get('filing_number'),
+                'filing_number': filing_number,
                 'estimated_completion': response.get('estimated_completion'),
                 'fees': response.get('fees')
             }
 
         except Exception as e:
             business.formation_status = 'error'
-            self.db_session.commit()
             raise Exception(f"Formation submission failed: {str(e)}")
 
     async def check_filing_status(self, business_id: int) -> Dict[str, Any]:
         """Check the status of a submitted LLC formation."""
-        business = self.db_session.query(Business).get(business_id)
+        business = self.db_session.get(Business, business_id)
         if not business or not business.state_filing_number:
             raise ValueError("Business or filing number not found")
 
+        try:
+            response = await self._check_status(business)
+        except Exception:
+            self.db_session.rollback()
+            raise
+        self.db_session.commit()
+        return response
+
+    async def _check_status(self, business: Business, use_cache: bool = True) -> Dict[str, Any]:
+        """Fetch one filing's status and stage completion on the business without committing.
+
+        use_cache=False always asks the state, for callers that pace their own polling.
+        """
+        if not business.state_filing_number:
+            raise ValueError("Filing number not found")
+
+        key = (business.state, business.state_filing_number)
+        if use_cache:
+            with _STATUS_CACHE_LOCK:
+                cached = _STATUS_CACHE.get(key)
+            if cached is not None:
+                return cached
+
         try:
             response = await self._submit_to_state_api(
                 business.state,
@@ -91,14 +423,20 @@ class StateFilingService:
                 {'filing_number': business.state_filing_number}
             )
 
+            # Pending filings are what get polled; a completed one is never
+            # cached, and its earlier pending entry is dropped, so its
+            # completion always reaches the database
+            with _STATUS_CACHE_LOCK:
+                if response.get('status') == 'completed':
+                    _STATUS_CACHE.pop(key, None)
+                else:
+                    _STATUS_CACHE[key] = response
+
             # Update business status if formation is complete
             if response.get('status') == 'completed':
                 business.formation_status = 'completed'
-                business.formation_date = datetime.strptime(
-                    response.get('completion_date'),
-                    '%Y-%m-%d'
-                )
-                self.db_session.commit()
+                # ISO dates parse without interpreting a format string
+                business.formation_date = datetime.fromisoformat(response.get('completion_date'))
 
             return response
 
@@ -107,10 +445,23 @@ class StateFilingService:
 
     async def retrieve_filed_documents(self, business_id: int) -> Dict[str, Any]:
         """Retrieve filed documents from the state."""
-        business = self.db_session.query(Business).get(business_id)
+        business = self.db_session.get(Business, business_id)
         if not business or not business.state_filing_number:
             raise ValueError("Business or filing number not found")
 
+        try:
+            response = await self._store_filed_documents(business)
+        except Exception:
+            self.db_session.rollback()
+            raise
+        self.db_session.commit()
+        return response
+
+    async def _store_filed_documents(self, business: Business) -> Dict[str, Any]:
+        """Fetch one filing's documents and insert them without committing."""
+        if not business.state_filing_number:
+            raise ValueError("Filing number not found")
+
         try:
             response = await self._submit_to_state_api(
                 business.state,
@@ -118,37 +469,69 @@ class StateFilingService:
                 {'filing_number': business.state_filing_number}
             )
 
-            # Save documents to database
-            for doc in response.get('documents', []):
-                document = Document(
-                    name=doc['name'],
-                    type=doc['type'],
-                    content=doc['content'],
-                    business_id=business_id,
-                    owner_id=business.owner_id,
-                    status='filed'
-                )
-                self.db_session.add(document)
-            
-            self.db_session.commit()
+            # Save documents to database in one multi-row INSERT
+            rows = [
+                {
+                    'name': doc['name'],
+                    'type': doc['type'],
+                    'content': doc['content'],
+                    'business_id': business.id,
+                    'owner_id': business.owner_id,
+                    'status': 'filed'
+                }
+                for doc in response.get('documents', [])
+            ]
+            if rows:
+                self.db_session.execute(insert(Document), rows)
             return response
 
         except Exception as e:
             raise Exception(f"Document retrieval failed: {str(e)}")
 
-    def _prepare_formation_documents(self, business: Business) -> Dict[str, str]:
-        """Prepare and format documents for state filing."""
+    def _load_businesses(self, business_ids: List[int]) -> List[Business]:
+        """Load several businesses and their owners in two queries."""
+        return self.db_session.query(Business).options(
+            selectinload(Business.owner)
+        ).filter(Business.id.in_(business_ids)).all()
+
+    def _draft_documents(self, business_ids: List[int]) -> Dict[int, List[Row]]:
+        """Draft documents for several businesses in one query, grouped by business id."""
+        drafts: Dict[int, List[Row]] = {}
+        for doc in self.db_session.execute(
+            select(*_DRAFT_COLUMNS, Document.business_id).where(
+                Document.business_id.in_(business_ids),
+                Document.status == 'draft'
+            )
+        ):
+            drafts.setdefault(doc.business_id, []).append(doc)
+        return drafts
+
+    def _prepare_formation_documents(self, business: Business,
+                                     business_docs: Optional[List[Row]] = None) -> Dict[str, str]:
+        """Prepare and format documents for state filing.
+
+        business_docs are the business's draft (name, type, content) rows when
+        the caller has already loaded them; otherwise they are queried here.
+        Plain rows are enough to serialise, so no Document instances are built.
+        """
         documents = {}
-        
+
         # Get all draft documents for the business
-        business_docs = self.db_session.query(Document).filter_by(
-            business_id=business.id,
-            status='draft'
-        ).all()
+        if business_docs is None:
+            business_docs = self.db_session.execute(
+                select(*_DRAFT_COLUMNS).where(
+                    Document.business_id == business.id,
+                    Document.status == 'draft'
+                )
+            ).all()
 
         for doc in business_docs:
-            # Convert document content to base64 if needed
-            content = base64.b64encode(doc.content.encode()).decode() if doc.content else ''
+            # Convert document content to base64 if needed; the output is ASCII,
+            # so the decode back to str is a straight copy
+            content = (
+                binascii.b2a_base64(doc.content.encode(), newline=False).decode('ascii')
+                if doc.content else ''
+            )
             documents[doc.type] = {
                 'name': doc.name,
                 'content': content,
@@ -157,11 +540,11 @@ class StateFilingService:
 
         return documents
 
-    def _format_owners(self, business: Business) -> List[Dict[str, Any]]:
-        """Format owner information for state filing."""
+    def _format_owners(self, business: Business, owner_name: str) -> List[Dict[str, Any]]:
+        """Format owner information for state filing; owner_name is the primary owner's full name."""
         # For now, just return the primary owner
         return [{
-            'name': f"{business.owner.first_name} {business.owner.last_name}",
+            'name': owner_name,
             'type': 'individual',
             'ownership_percentage': 100,
             'address': business.owner_address
@@ -172,48 +555,28 @@ class StateFilingService:
         if state not in self.api_endpoints:
             raise ValueError(f"State {state} not supported")
 
-        api_config = self.api_endpoints[state]
-        url = f"{api_config['base_url']}{api_config[endpoint_type]}"
-
-        headers = {
-            'Authorization': f"Bearer {self.api_keys[state]}",
-            'Content-Type': 'application/json'
-        }
+        url = self._ENDPOINT_URLS[state, endpoint_type]
+        headers = self._headers_by_state[state]
 
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            # orjson writes the base64 document bodies straight to bytes instead
+            # of building an escaped str first
+            response = await self.client.post(url, content=orjson.dumps(payload), headers=headers)
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return orjson.loads(response.content)
+        except httpx.HTTPError as e:
             raise Exception(f"API request failed: {str(e)}")
 
     async def calculate_filing_fees(self, business_id: int) -> Dict[str, float]:
         """Calculate filing fees for LLC formation."""
-        business = self.db_session.query(Business).get(business_id)
+        business = self.db_session.get(Business, business_id)
         if not business:
             raise ValueError("Business not found")
 
-        # State-specific fee calculations
-        state_fees = {
-            'DE': {
-                'formation': 90.00,
-                'registered_agent': 50.00,
-                'expedited': 50.00,
-                'certified_copy': 30.00
-            },
-            'WY': {
-                'formation': 100.00,
-                'registered_agent': 50.00,
-                'expedited': 50.00,
-                'certified_copy': 30.00
-            }
-        }
-
-        fees = state_fees.get(business.state, {})
-        total = sum(fees.values())
+        fees = self.STATE_FEES.get(business.state, {})
 
         return {
-            'breakdown': fees,
-            'total': total,
+            'breakdown': dict(fees),
+            'total': self._STATE_FEE_TOTALS.get(business.state, 0),
             'currency': 'USD'
         }
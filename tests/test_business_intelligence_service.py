@@ -1,8 +1,16 @@
 import unittest
 import asyncio
+import os
+import tempfile
+from types import SimpleNamespace
 from unittest.mock import Mock, patch, MagicMock, AsyncMock
 from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from models import Base, Business, ComplianceItem
+from services import insight_cache
 from services.business_intelligence_service_v2 import EnhancedBusinessIntelligenceService
+import orjson
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
@@ -19,7 +27,7 @@ class TestEnhancedBusinessIntelligenceService(unittest.TestCase):
             state="DE",
             formation_date=datetime.now() - timedelta(days=365)
         )
-        self.db_session.query.return_value.get.return_value = self.mock_business
+        self.db_session.get.return_value = self.mock_business
 
     def test_prepare_segmentation_features(self):
         # Create sample transaction data
@@ -236,10 +244,11 @@ class TestEnhancedBusinessIntelligenceService(unittest.TestCase):
 
             # Mock non-async methods
             self.service._get_business_metrics = Mock(return_value=mock_metrics)
-            self.service._compare_with_benchmarks = Mock(return_value={
-                "financial": {"revenue": "above_average", "profit_margin": "above_average"},
-                "operational": {"efficiency": "above_average", "productivity": "above_average"}
-            })
+            self.service._compare_with_benchmarks = Mock(return_value=pd.DataFrame({
+                "category": ["financial", "financial", "operational", "operational"],
+                "metric": ["revenue", "profit_margin", "efficiency", "productivity"],
+                "performance": ["Above Average"] * 4
+            }))
             self.service._generate_benchmark_recommendations = Mock(return_value=[
                 "Maintain strong financial performance",
                 "Continue operational excellence"
@@ -256,6 +265,90 @@ class TestEnhancedBusinessIntelligenceService(unittest.TestCase):
         self.assertIn('comparison', result)
         self.assertIn('recommendations', result)
 
+    def test_analysis_truncated_twice_returns_error_uncached(self):
+        truncated = SimpleNamespace(choices=[SimpleNamespace(
+            message=SimpleNamespace(content='{"market_opportunities": ["Expand')
+        )])
+        self.service.client = Mock()
+        self.service.client.chat.completions.create = AsyncMock(return_value=truncated)
+
+        with tempfile.TemporaryDirectory() as tmpdir, patch.dict(os.environ, {
+            'INSIGHT_CACHE_PATH': os.path.join(tmpdir, 'cache.db')
+        }):
+            try:
+                result = run_async_test(self.service.analyze_business(1))
+
+                self.assertEqual(result, {"error": "Analysis could not be parsed"})
+                self.assertEqual(self.service.client.chat.completions.create.await_count, 2)
+                messages = self.service._analysis_messages(self.mock_business)
+                self.assertIsNone(insight_cache.get(self.service._completion_key(
+                    messages, self.service.ANALYSIS_MODEL, self.service._ANALYSIS_OPTIONS
+                )))
+            finally:
+                conn = insight_cache._local.__dict__.pop('conn', None)
+                if conn is not None:
+                    conn.close()
+
+class TestRiskAssessment(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {
+            'INSIGHT_CACHE_PATH': os.path.join(self.tmpdir.name, 'cache.db')
+        })
+        self.env.start()
+
+        self.engine = create_engine('sqlite://')
+        Base.metadata.create_all(self.engine)
+        self.session = Session(self.engine)
+        business = Business(name="Test LLC", industry="Technology", state="DE")
+        self.session.add(business)
+        self.session.flush()
+        self.session.add_all([
+            ComplianceItem(business_id=business.id, type="annual_report", status="pending",
+                           description="File annual report", due_date=datetime.utcnow() - timedelta(days=1)),
+            ComplianceItem(business_id=business.id, type="franchise_tax", status="pending",
+                           due_date=datetime.utcnow() + timedelta(days=10)),
+            ComplianceItem(business_id=business.id, type="boi_report", status="completed",
+                           due_date=datetime.utcnow() - timedelta(days=5)),
+        ])
+        self.session.commit()
+
+        self.service = EnhancedBusinessIntelligenceService(self.session)
+        self.service.client = Mock()
+        self.service.client.chat.completions.create = AsyncMock(side_effect=self._reply)
+
+    def tearDown(self):
+        self.env.stop()
+        conn = insight_cache._local.__dict__.pop('conn', None)
+        if conn is not None:
+            conn.close()
+        self.session.close()
+        self.tmpdir.cleanup()
+
+    async def _reply(self, **kwargs):
+        if kwargs["response_format"]["json_schema"]["name"] == "RiskList":
+            category = "market" if "market risks" in kwargs["messages"][-1]["content"] else "staffing"
+            payload = {"risks": [{"type": category, "severity": "low", "description": f"{category} risk"}]}
+        else:
+            payload = {"strategies": [{"risk_type": "market", "strategy": "Diversify customers"}]}
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=orjson.dumps(payload).decode()))])
+
+    def test_generate_risk_assessment(self):
+        result = run_async_test(self.service.generate_risk_assessment(1))
+
+        risks = result["risk_assessment"]
+        self.assertEqual(risks["financial_risks"], [])
+        self.assertEqual([risk["type"] for risk in risks["market_risks"]], ["market"])
+        self.assertEqual([risk["type"] for risk in risks["operational_risks"]], ["staffing"])
+        self.assertEqual(
+            [(risk["type"], risk["severity"]) for risk in risks["compliance_risks"]],
+            [("annual_report", "high"), ("franchise_tax", "medium")]
+        )
+        self.assertEqual(result["mitigation_strategies"], [{"risk_type": "market", "strategy": "Diversify customers"}])
+        # Two low risks at 5 points, one medium at 10 and one high at 20
+        self.assertEqual(result["risk_score"], 40)
+        self.assertEqual(self.service.client.chat.completions.create.await_count, 3)
+
 def run_async_test(coro):
     return asyncio.run(coro)
 
@@ -0,0 +1,51 @@
+import asyncio
+import json
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+from services.chat_service import ChatService
+from services.semantic_cache import SemanticCache
+
+def _reply(content, finish_reason="stop"):
+    return SimpleNamespace(choices=[SimpleNamespace(
+        finish_reason=finish_reason, message=SimpleNamespace(content=content)
+    )])
+
+class TestChatService(unittest.TestCase):
+    def setUp(self):
+        self.service = ChatService(Mock())
+        self.service.cache = SemanticCache()
+        self.service.client = Mock()
+        # Embeddings fail, so only the exact-match tier is used
+        self.service.client.embeddings.create = AsyncMock(side_effect=RuntimeError("offline"))
+
+    def test_reply_is_cached(self):
+        reply = {"message": "File articles of organization.", "actions": []}
+        self.service.client.chat.completions.create = AsyncMock(return_value=_reply(json.dumps(reply)))
+
+        result = asyncio.run(self.service.get_response(1, "How do I start?"))
+
+        self.assertEqual(result["message"], reply["message"])
+        self.assertEqual(self.service.cache.get_exact("user:1:biz:None", "How do I start?"), reply)
+
+    def test_truncated_reply_is_not_shown_or_cached(self):
+        self.service.client.chat.completions.create = AsyncMock(
+            return_value=_reply('{"message": "File articles of', finish_reason="length")
+        )
+
+        result = asyncio.run(self.service.get_response(1, "How do I start?"))
+
+        self.assertIn("error", result)
+        self.assertNotIn('{"message"', result["message"])
+        self.assertIsNone(self.service.cache.get_exact("user:1:biz:None", "How do I start?"))
+
+    def test_off_schema_analysis_is_not_cached(self):
+        self.service.client.chat.completions.create = AsyncMock(return_value=_reply('{"analysis": "Grow"}'))
+
+        result = asyncio.run(self.service.analyze_business_query("Should we expand?", 1))
+
+        self.assertTrue(result["error"].startswith("Analysis failed"))
+        self.assertIsNone(self.service.cache.get_exact("biz:1:category:None", "Should we expand?"))
+
+if __name__ == '__main__':
+    unittest.main()
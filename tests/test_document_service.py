@@ -1,8 +1,13 @@
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch
 from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from services import document_service
 from services.document_service import DocumentService
-from models import Business, User, Document
+from models import Base, Business, User, Document
 
 class TestDocumentService(unittest.TestCase):
     def setUp(self):
@@ -25,7 +30,7 @@ class TestDocumentService(unittest.TestCase):
         )
 
         # Configure mock database query
-        self.db_session.query.return_value.get.return_value = mock_business
+        self.db_session.get.return_value = mock_business
 
         # Call the method
         result = self.document_service.generate_operating_agreement(1)
@@ -56,7 +61,7 @@ class TestDocumentService(unittest.TestCase):
             owner_id=1
         )
 
-        self.db_session.query.return_value.get.return_value = mock_business
+        self.db_session.get.return_value = mock_business
 
         # Call the method
         result = self.document_service.generate_articles_of_organization(1)
@@ -75,7 +80,7 @@ class TestDocumentService(unittest.TestCase):
             name="Test Document"
         )
 
-        self.db_session.query.return_value.get.return_value = mock_document
+        self.db_session.get.return_value = mock_document
 
         # Call the method
         result = self.document_service.get_document(1, 1)
@@ -91,7 +96,7 @@ class TestDocumentService(unittest.TestCase):
             name="Test Document"
         )
 
-        self.db_session.query.return_value.get.return_value = mock_document
+        self.db_session.get.return_value = mock_document
 
         # Assert that accessing document raises PermissionError
         with self.assertRaises(PermissionError):
@@ -106,7 +111,7 @@ class TestDocumentService(unittest.TestCase):
             content="Original content"
         )
 
-        self.db_session.query.return_value.get.return_value = mock_document
+        self.db_session.get.return_value = mock_document
 
         # Update document
         updates = {
@@ -129,7 +134,7 @@ class TestDocumentService(unittest.TestCase):
             name="Test Document"
         )
 
-        self.db_session.query.return_value.get.return_value = mock_document
+        self.db_session.get.return_value = mock_document
 
         # Delete document
         self.document_service.delete_document(1, 1)
@@ -139,18 +144,13 @@ class TestDocumentService(unittest.TestCase):
         self.db_session.commit.assert_called_once()
 
     def test_list_documents(self):
-        # Mock business and documents
-        mock_business = Mock(
-            id=1,
-            owner_id=1
-        )
+        # Mock documents of a business the user owns
         mock_documents = [
             Mock(id=1, name="Doc 1"),
             Mock(id=2, name="Doc 2")
         ]
 
-        self.db_session.query.return_value.get.return_value = mock_business
-        self.db_session.query.return_value.filter_by.return_value.all.return_value = mock_documents
+        self.db_session.query.return_value.join.return_value.filter.return_value.all.return_value = mock_documents
 
         # List documents
         result = self.document_service.list_documents(1, 1)
@@ -160,17 +160,64 @@ class TestDocumentService(unittest.TestCase):
         self.assertEqual(result, mock_documents)
 
     def test_list_documents_without_permission(self):
-        # Mock business owned by different user
-        mock_business = Mock(
-            id=1,
-            owner_id=2
-        )
-
-        self.db_session.query.return_value.get.return_value = mock_business
+        # Business owned by a different user matches neither query
+        self.db_session.query.return_value.join.return_value.filter.return_value.all.return_value = []
+        self.db_session.query.return_value.filter_by.return_value.first.return_value = None
 
         # Assert that listing documents raises PermissionError
         with self.assertRaises(PermissionError):
             self.document_service.list_documents(1, 1)
 
+class TestQueueDocuments(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine(
+            'sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool
+        )
+        Base.metadata.create_all(engine)
+        self.session_factory = sessionmaker(bind=engine)
+        self.session = self.session_factory()
+        owner = User(email='jane@example.com', password_hash='x', first_name='Jane', last_name='Doe')
+        self.business = Business(name='Test LLC', industry='Technology', state='DE', owner=owner)
+        self.session.add(self.business)
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def _queue(self, document_types):
+        # A private executor, so the test can wait for its workers
+        executor = ThreadPoolExecutor(max_workers=2)
+        with patch.object(document_service, '_RENDER_EXECUTOR', executor):
+            documents = DocumentService(self.session).queue_documents(
+                self.business.id, document_types, self.session_factory
+            )
+            ids = [document.id for document in documents]
+        executor.shutdown(wait=True)
+        self.session.expire_all()
+        return [self.session.get(Document, document_id) for document_id in ids]
+
+    def test_workers_render_or_fail_each_document(self):
+        failing = ('Form SS-4', Mock(side_effect=RuntimeError('render failed')))
+        with patch.dict(DocumentService._DOCUMENT_TYPES, {'ein_application': failing}), \
+                self.assertLogs('services.document_service', level='ERROR') as logs:
+            articles, ein = self._queue(['articles_of_organization', 'ein_application'])
+
+        self.assertEqual(articles.status, 'draft')
+        self.assertIn('Test LLC', articles.content)
+        self.assertEqual((ein.status, ein.content), ('failed', None))
+        self.assertIn(f'queued document {ein.id} failed', logs.output[0])
+
+    def test_deleted_document_is_skipped(self):
+        document = Document(name='Gone', type='articles_of_organization', status='queued')
+        self.session.add(document)
+        self.session.commit()
+        document_id = document.id
+        self.session.delete(document)
+        self.session.commit()
+
+        document_service._render_queued_document(self.session_factory, document_id)
+
+        self.assertIsNone(self.session.get(Document, document_id))
+
 if __name__ == '__main__':
     unittest.main()
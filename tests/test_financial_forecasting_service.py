@@ -0,0 +1,109 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from models import Base, Business, FinancialRecord
+from services import financial_forecasting_service
+from services.financial_forecasting_service import FinancialForecastingService
+
+class FixedDatetime(datetime):
+    @classmethod
+    def utcnow(cls):
+        return cls(2024, 7, 15)
+
+# Twelve months of history, August 2023 to July 2024
+HISTORY_MONTHS = [(2023, month) for month in range(8, 13)] + [(2024, month) for month in range(1, 8)]
+
+class TestFinancialForecastingService(unittest.TestCase):
+    def setUp(self):
+        financial_forecasting_service._HISTORY_CACHE.clear()
+        self.engine = create_engine('sqlite://')
+        Base.metadata.create_all(self.engine)
+        self.session = Session(self.engine)
+        self.session.add(Business(id=1, name='Test LLC', industry='Technology', state='DE'))
+        self.session.commit()
+        self.service = FinancialForecastingService(self.session)
+        self.clock = patch.object(financial_forecasting_service, 'datetime', FixedDatetime)
+        self.clock.start()
+
+    def tearDown(self):
+        self.clock.stop()
+        financial_forecasting_service._HISTORY_CACHE.clear()
+        self.session.close()
+
+    def _add_history(self, revenue, expense=None):
+        """One revenue (and optionally expense) record per history month; expenses are stored negative."""
+        for (year, month), amount in zip(HISTORY_MONTHS, revenue):
+            self.session.add(FinancialRecord(business_id=1, type='revenue', amount=amount, date=datetime(year, month, 1)))
+            if expense is not None:
+                self.session.add(FinancialRecord(business_id=1, type='expense', amount=-expense, date=datetime(year, month, 1)))
+        self.session.commit()
+
+    def test_seasonal_factors_follow_calendar_months(self):
+        # History starting in July, with December twice the other months
+        keys = [f"2023-{month:02d}" for month in range(7, 13)] + [f"2024-{month:02d}" for month in range(1, 7)]
+        data = np.array([2000.0 if key.endswith('-12') else 1000.0 for key in keys])
+
+        factors = self.service._calculate_seasonal_factors(data, keys)
+
+        overall = 13000 / 12
+        self.assertAlmostEqual(factors[11], 2000 / overall)
+        for month in range(11):
+            self.assertAlmostEqual(factors[month], 1000 / overall)
+
+    def test_forecast_applies_december_factor_to_december(self):
+        revenue = [2000.0 if month == 12 else 1000.0 for _, month in HISTORY_MONTHS]
+        self._add_history(revenue)
+
+        forecast = self.service.generate_financial_forecast(1)
+
+        slope, intercept = np.polyfit(np.arange(12), revenue, 1)
+        amounts = {row['date']: row['amount'] for row in forecast['revenue_forecast']}
+        # 2024-07-15 plus 150 days is the fifth forecast month
+        self.assertAlmostEqual(amounts['2024-12'], (slope * 16 + intercept) * 2000 / (13000 / 12))
+        self.assertAlmostEqual(amounts['2024-11'], (slope * 15 + intercept) * 1000 / (13000 / 12))
+
+    def test_scenarios_scale_revenue_and_expenses(self):
+        self._add_history([1000.0] * 12, expense=600.0)
+
+        scenarios = self.service.generate_financial_scenarios(1, months=6)
+
+        expected = {
+            'optimistic': (1200.0, 540.0),
+            'realistic': (1000.0, 600.0),
+            'pessimistic': (800.0, 660.0),
+        }
+        for name, (revenue, expenses) in expected.items():
+            scenario = scenarios[name]
+            self.assertEqual(len(scenario['revenue_forecast']), 6)
+            self.assertAlmostEqual(scenario['revenue_forecast'][0]['amount'], revenue)
+            self.assertAlmostEqual(scenario['expense_forecast'][0]['amount'], expenses)
+            self.assertAlmostEqual(scenario['cash_flow_forecast'][0]['net_cash_flow'], revenue - expenses)
+            metrics = scenario['metrics']
+            self.assertAlmostEqual(metrics['projected_profit_margin'], (revenue - expenses) / revenue)
+            self.assertAlmostEqual(metrics['average_monthly_revenue'], revenue)
+            self.assertAlmostEqual(metrics['average_monthly_expenses'], expenses)
+            self.assertEqual(metrics['breakeven_months'], 0)
+
+    def test_history_cache_is_invalidated_by_orm_inserts(self):
+        self._add_history([1000.0] * 12)
+        before = self.service.generate_financial_forecast(1)['metrics']['average_monthly_revenue']
+
+        # Writes that bypass the ORM are not seen while the history is cached
+        self.session.execute(text(
+            "INSERT INTO financial_records (business_id, type, amount, date) "
+            "VALUES (1, 'revenue', 1200, '2024-07-10 00:00:00')"
+        ))
+        self.session.commit()
+        self.assertEqual(self.service.generate_financial_forecast(1)['metrics']['average_monthly_revenue'], before)
+
+        self.session.add(FinancialRecord(business_id=1, type='revenue', amount=1200, date=datetime(2024, 7, 12)))
+        self.session.commit()
+        after = self.service.generate_financial_forecast(1)['metrics']['average_monthly_revenue']
+
+        self.assertNotEqual(after, before)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from services import insight_cache
+
+class TestInsightCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {
+            'INSIGHT_CACHE_PATH': os.path.join(self.tmpdir.name, 'cache.db')
+        })
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        conn = insight_cache._local.__dict__.pop('conn', None)
+        if conn is not None:
+            conn.close()
+        self.tmpdir.cleanup()
+
+    def test_put_then_get(self):
+        key = insight_cache.make_key("Technology", "DE", "gpt-3.5-turbo")
+        self.assertIsNone(insight_cache.get(key))
+
+        insight_cache.put(key, "Strategic insights")
+
+        self.assertEqual(insight_cache.get(key), "Strategic insights")
+
+    def test_make_key_is_stable(self):
+        self.assertEqual(
+            insight_cache.make_key("Retail", "WY"),
+            insight_cache.make_key("Retail", "WY")
+        )
+        self.assertNotEqual(
+            insight_cache.make_key("Retail", "WY"),
+            insight_cache.make_key("Retail", "DE")
+        )
+
+    def test_expired_entries_are_ignored_and_purged(self):
+        insight_cache.put("old", "stale content")
+        insight_cache._connection().execute(
+            "UPDATE insight_cache SET created_at = ? WHERE key = 'old'",
+            (time.time() - 120,)
+        )
+        insight_cache.put("new", "fresh content")
+
+        self.assertIsNone(insight_cache.get("old", ttl=60))
+        self.assertEqual(insight_cache.purge(ttl=60), 1)
+        self.assertEqual(insight_cache.get("new", ttl=60), "fresh content")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+from services import insight_cache
+from services.llc_builder_service import LLCBuilderService
+
+PLAN = {
+    "registration_steps": [{"step_number": 1, "description": "File", "requirements": []}],
+    "required_documents": [],
+    "estimated_costs": {"filing_fee": 100},
+    "timeline": []
+}
+
+class TestLLCBuilderService(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {
+            'INSIGHT_CACHE_PATH': os.path.join(self.tmpdir.name, 'cache.db')
+        })
+        self.env.start()
+
+        # The real client needs an API key; these tests never reach it
+        with patch('services.llc_builder_service.get_async_client', return_value=Mock()):
+            self.service = LLCBuilderService(Mock())
+        self.service.client.chat.completions.create = AsyncMock(return_value=SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(PLAN)))]
+        ))
+
+    def tearDown(self):
+        self.env.stop()
+        conn = insight_cache._local.__dict__.pop('conn', None)
+        if conn is not None:
+            conn.close()
+        self.tmpdir.cleanup()
+
+    def test_formation_plan_is_cached_across_llc_names(self):
+        first = {"name": "Alpha LLC", "state": "DE", "industry": "Retail"}
+        second = {"name": "Beta LLC", "state": "DE", "industry": "Retail"}
+
+        self.assertEqual(asyncio.run(self.service._generate_formation_plan(first)), PLAN)
+        self.assertEqual(asyncio.run(self.service._generate_formation_plan(second)), PLAN)
+        self.service.client.chat.completions.create.assert_awaited_once()
+
+    def test_formation_plan_differs_by_state(self):
+        asyncio.run(self.service._generate_formation_plan({"state": "DE", "industry": "Retail"}))
+        asyncio.run(self.service._generate_formation_plan({"state": "WY", "industry": "Retail"}))
+
+        self.assertEqual(self.service.client.chat.completions.create.await_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from sqlalchemy.orm import Session
+from models import Business, ComplianceItem, init_db
+
+class TestMigrateDb(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'old.db')
+        # Tables as the pre-consolidation schema created them, before the new columns
+        conn = sqlite3.connect(self.path)
+        conn.executescript("""
+            CREATE TABLE businesses (
+                id INTEGER NOT NULL, name VARCHAR NOT NULL, industry VARCHAR NOT NULL,
+                state VARCHAR NOT NULL, is_nonprofit BOOLEAN, tax_classification VARCHAR,
+                mission_statement VARCHAR, created_at DATETIME, PRIMARY KEY (id)
+            );
+            CREATE TABLE compliance_items (
+                id INTEGER NOT NULL, business_id INTEGER, type VARCHAR NOT NULL,
+                due_date DATETIME, status VARCHAR, description VARCHAR,
+                requirements JSON, created_at DATETIME, PRIMARY KEY (id)
+            );
+            INSERT INTO businesses (id, name, industry, state) VALUES (1, 'Acme LLC', 'Tech', 'DE');
+            INSERT INTO compliance_items (id, business_id, type) VALUES (1, 1, 'annual_report');
+        """)
+        conn.close()
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_existing_rows_load_after_migration(self):
+        self.engine = init_db(f'sqlite:///{self.path}')
+
+        with Session(self.engine) as session:
+            business = session.get(Business, 1)
+            self.assertEqual(business.name, 'Acme LLC')
+            self.assertIsNone(business.state_filing_number)
+            self.assertIsNone(session.get(ComplianceItem, 1).notes)
+
+            business.state_filing_number = 'DE-123'
+            session.commit()
+
+        # Running it again finds nothing left to add
+        self.engine.dispose()
+        self.engine = init_db(f'sqlite:///{self.path}')
+        with Session(self.engine) as session:
+            self.assertEqual(session.get(Business, 1).state_filing_number, 'DE-123')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import asyncio
+import unittest
+from services.openai_client import LoopBoundClient, OpenAIThrottle, SingleFlight, estimate_tokens
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_result(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "insights"
+
+        async def run():
+            return await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+
+        results = asyncio.run(run())
+
+        self.assertEqual(results, ["insights"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight._inflight, {})
+
+    def test_errors_propagate_to_every_waiter(self):
+        flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failure")
+
+        async def run():
+            return await asyncio.gather(
+                *(flight.do("key", fetch) for _ in range(3)),
+                return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(flight._inflight, {})
+
+class TestOpenAIThrottle(unittest.TestCase):
+    def test_estimate_tokens_counts_prompt_and_completion(self):
+        messages = [{"role": "user", "content": "x" * 400}]
+        self.assertEqual(estimate_tokens(messages), 104)
+        self.assertEqual(estimate_tokens(messages, max_tokens=50), 154)
+
+    def test_acquire_draws_down_both_buckets(self):
+        throttle = OpenAIThrottle(max_requests_per_minute=60, max_tokens_per_minute=1000)
+
+        asyncio.run(throttle.acquire(400))
+
+        self.assertAlmostEqual(throttle.available_request_capacity, 59, places=0)
+        self.assertAlmostEqual(throttle.available_token_capacity, 600, delta=1)
+
+    def test_reconcile_refunds_unused_estimate(self):
+        throttle = OpenAIThrottle(max_requests_per_minute=60, max_tokens_per_minute=1000)
+        asyncio.run(throttle.acquire(400))
+
+        throttle.reconcile(estimated=400, actual=150)
+
+        self.assertAlmostEqual(throttle.available_token_capacity, 850, delta=1)
+
+class TestLoopBoundClient(unittest.TestCase):
+    def test_each_loop_gets_its_own_client(self):
+        closed = []
+
+        class FakeClient:
+            async def post(self):
+                return self
+
+        async def close(client):
+            closed.append(client)
+
+        bound = LoopBoundClient(FakeClient, close)
+
+        async def use():
+            first = await bound.post()
+            self.assertIs(await bound.post(), first)
+            return first
+
+        first = asyncio.run(use())
+        # Built outside any loop, the call binds to the loop that awaits it
+        second = asyncio.run(bound.post())
+        self.assertIsNot(first, second)
+
+        async def close_running():
+            client = await bound.post()
+            await bound.aclose()
+            return client
+
+        self.assertEqual(closed, [asyncio.run(close_running())])
+
+if __name__ == '__main__':
+    unittest.main()
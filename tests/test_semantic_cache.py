@@ -0,0 +1,30 @@
+import unittest
+from services.semantic_cache import SemanticCache
+
+class TestSemanticCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = SemanticCache(threshold=0.9, max_entries=2)
+
+    def test_exact_match_is_served_without_embedding(self):
+        self.cache.store("user:1", "What is an EIN?", None, {"message": "A tax ID"})
+
+        self.assertEqual(self.cache.get_exact("user:1", "What is an EIN?"), {"message": "A tax ID"})
+        self.assertIsNone(self.cache.get_exact("user:2", "What is an EIN?"))
+
+    def test_similar_embedding_hits_and_dissimilar_misses(self):
+        self.cache.store("user:1", "What is an EIN?", [1.0, 0.0, 0.1], {"message": "A tax ID"})
+
+        self.assertEqual(self.cache.lookup("user:1", [0.9, 0.0, 0.1]), {"message": "A tax ID"})
+        self.assertIsNone(self.cache.lookup("user:1", [0.0, 1.0, 0.0]))
+        self.assertIsNone(self.cache.lookup("user:2", [1.0, 0.0, 0.1]))
+
+    def test_oldest_embeddings_are_evicted(self):
+        self.cache.store("user:1", "a", [1.0, 0.0, 0.0], {"message": "a"})
+        self.cache.store("user:1", "b", [0.0, 1.0, 0.0], {"message": "b"})
+        self.cache.store("user:1", "c", [0.0, 0.0, 1.0], {"message": "c"})
+
+        self.assertIsNone(self.cache.lookup("user:1", [1.0, 0.0, 0.0]))
+        self.assertEqual(self.cache.lookup("user:1", [0.0, 1.0, 0.0]), {"message": "b"})
+
+if __name__ == '__main__':
+    unittest.main()
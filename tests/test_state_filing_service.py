@@ -0,0 +1,141 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from models import Base, Business, Document, User
+from services import state_filing_service
+from services.state_filing_service import StateFilingService
+
+class TestStateFilingService(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine(
+            'sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool
+        )
+        Base.metadata.create_all(self.engine)
+        self.session = Session(self.engine)
+
+        owner = User(email='jane@example.com', password_hash='x', first_name='Jane', last_name='Doe')
+        self.session.add(owner)
+        self.session.add_all([
+            Business(
+                name=f'Business {n}', industry='Technology', state='DE', owner=owner,
+                registered_agent='Agent Co', registered_agent_address='1 Main St'
+            )
+            for n in range(1, 4)
+        ])
+        self.session.commit()
+        self.service = StateFilingService(self.session)
+
+    def tearDown(self):
+        state_filing_service._STATUS_CACHE.clear()
+        self.session.close()
+        self.engine.dispose()
+
+    async def _fake_state_api(self, state, endpoint_type, payload):
+        """Accept every formation; Business 2 is still pending on its first status poll."""
+        self.requests.append((endpoint_type, payload))
+        if endpoint_type == 'formation':
+            return {'filing_number': f"DE-{payload['business_name'][-1]}"}
+        if endpoint_type == 'status':
+            polls = sum(1 for request in self.requests if request == (endpoint_type, payload))
+            if payload['filing_number'] == 'DE-2' and polls == 1:
+                return {'status': 'pending'}
+            return {'status': 'completed', 'completion_date': '2024-03-01T00:00:00'}
+        return {'documents': [
+            {'name': 'Certificate of Formation', 'type': 'certificate', 'content': payload['filing_number']}
+        ]}
+
+    def _filing_numbers(self):
+        with Session(self.engine) as session:
+            return {business.id: business.state_filing_number for business in session.query(Business)}
+
+    def test_accepted_submissions_survive_cancellation(self):
+        accepted = asyncio.Event()
+
+        async def fake_submit(state, endpoint_type, payload):
+            if payload['business_name'] == 'Business 1':
+                accepted.set()
+                return {'filing_number': 'DE-1'}
+            # The other formations are still waiting on the state
+            await asyncio.Event().wait()
+
+        async def run():
+            task = asyncio.create_task(self.service.submit_llc_formations([1, 2, 3]))
+            await accepted.wait()
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with patch.object(self.service, '_submit_to_state_api', side_effect=fake_submit):
+            asyncio.run(run())
+
+        self.assertEqual(self._filing_numbers(), {1: 'DE-1', 2: None, 3: None})
+
+    def test_completion_replaces_cached_pending_status(self):
+        business = self.session.get(Business, 1)
+        business.state_filing_number = 'DE-1'
+        self.session.commit()
+        calls = []
+
+        async def fake_submit(state, endpoint_type, payload):
+            calls.append(payload)
+            if len(calls) == 1:
+                return {'status': 'pending'}
+            return {'status': 'completed', 'completion_date': '2024-03-01T00:00:00'}
+
+        with patch.object(self.service, '_submit_to_state_api', side_effect=fake_submit):
+            self.assertEqual(asyncio.run(self.service.check_filing_status(1))['status'], 'pending')
+            # A pipeline poll bypasses the cache and sees the completion
+            asyncio.run(self.service._check_status(self.session.get(Business, 1), use_cache=False))
+            self.session.commit()
+
+            self.assertEqual(
+                asyncio.run(self.service.check_filing_statuses([1]))[1]['status'], 'completed'
+            )
+
+    def test_process_formations_runs_every_stage(self):
+        self.session.add(Business(name='Business 4', industry='Technology', state='CA'))
+        self.session.commit()
+        self.requests = []
+
+        with patch.object(self.service, '_submit_to_state_api', side_effect=self._fake_state_api):
+            results = asyncio.run(self.service.process_formations([1, 2, 3, 4, 99], poll_interval=0))
+
+        for business_id in (1, 2, 3):
+            self.assertEqual(results[business_id], {'stage': 'done', 'status': 'completed'})
+        self.assertEqual(results[4], {'stage': 'submit', 'status': 'error', 'message': 'State CA not supported'})
+        self.assertEqual(results[99]['message'], 'Business not found')
+        # One submission per business, however many polls it took
+        self.assertEqual(
+            sorted(payload['business_name'] for endpoint_type, payload in self.requests if endpoint_type == 'formation'),
+            ['Business 1', 'Business 2', 'Business 3']
+        )
+        self.assertEqual(self.requests.count(('status', {'filing_number': 'DE-2'})), 2)
+
+        self.assertEqual(self._filing_numbers(), {1: 'DE-1', 2: 'DE-2', 3: 'DE-3', 4: None})
+        with Session(self.engine) as session:
+            business = session.get(Business, 2)
+            self.assertEqual(business.formation_status, 'completed')
+            self.assertEqual(business.formation_date.year, 2024)
+            documents = session.query(Document).filter_by(business_id=2).all()
+            self.assertEqual([(doc.content, doc.status) for doc in documents], [('DE-2', 'filed')])
+
+    def test_batch_reports_failures_per_business(self):
+        self.requests = []
+        with patch.object(self.service, '_submit_to_state_api', side_effect=self._fake_state_api):
+            asyncio.run(self.service.submit_llc_formations([1, 2]))
+            results = asyncio.run(self.service.retrieve_filed_documents_batch([1, 2, 3]))
+
+        self.assertEqual(results[1]['documents'][0]['content'], 'DE-1')
+        self.assertEqual(results[3], {'status': 'error', 'message': 'Filing number not found'})
+        with Session(self.engine) as session:
+            self.assertEqual(
+                sorted(doc.business_id for doc in session.query(Document).filter_by(status='filed')),
+                [1, 2]
+            )
+
+if __name__ == '__main__':
+    unittest.main()